@@ -0,0 +1,166 @@
+# coding=utf-8
+from __future__ import absolute_import, print_function
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Drives GpxPrinter.write/readline the way OctoPrint's comm layer does (send a
+# numbered line, read until the ok) against the simulated bot in
+# fake_gcodex3g and reports lines/sec, ack latency and CPU per line.
+#
+#     python benchmarks/bench_gpxprinter.py [-n LINES]
+
+import argparse
+import collections
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_gcodex3g
+fake_gcodex3g.install()
+
+from octoprint_GPX import gpxprinter
+from octoprint_GPX.stats import Histogram
+
+class FakeSettings():
+	def __init__(self, **overrides):
+		self._values = dict(
+			verbose=False,
+			connection_pause=0,
+			threaded_writer=False,
+			writer_queue_size=32,
+			threaded_reader=False,
+			reader_poll_interval=0.5)
+		self._values.update(overrides)
+
+	def get(self, path):
+		return self._values.get(path[0])
+
+	def get_boolean(self, path):
+		return bool(self._values.get(path[0]))
+
+	def get_int(self, path):
+		value = self._values.get(path[0])
+		return None if value is None else int(value)
+
+	def get_float(self, path):
+		value = self._values.get(path[0])
+		return None if value is None else float(value)
+
+	def get_plugin_logfile_path(self):
+		return os.path.join(tempfile.gettempdir(), "gpx-bench.log")
+
+class FakePrinter():
+	def is_printing(self):
+		return True
+
+	def is_paused(self):
+		return False
+
+	def get_current_job(self):
+		return dict(file=dict(origin="local"))
+
+	def cancel_print(self):
+		pass
+
+class FakePlugin():
+	def __init__(self, settings):
+		self._logger = logging.getLogger("gpx.bench")
+		self._settings = settings
+		self._printer = FakePrinter()
+		self.coalesce_tolerance = settings.get(["coalesce_tolerance"]) or 0
+
+	def get_plugin_data_folder(self):
+		return tempfile.gettempdir()
+
+def checksum(line):
+	cs = 0
+	for c in line:
+		cs ^= ord(c)
+	return cs
+
+def gcode_lines(count):
+	for i in range(count):
+		line = "N%d G1 X%.3f Y%.3f E%.5f" % (i + 1, (i % 200) * 0.1, (i % 170) * 0.1, i * 0.001)
+		yield "%s*%d\n" % (line, checksum(line))
+
+def wait_ok(printer, in_flight, latency):
+	while True:
+		response = printer.readline()
+		if response.startswith(b"ok"):
+			break
+	latency.record(time.time() - in_flight.popleft())
+
+def cpu_time():
+	t = os.times()
+	return t[0] + t[1]
+
+def run(name, count, settings, bot):
+	fake_gcodex3g.configure(**bot)
+	printer = gpxprinter.GpxPrinter(FakePlugin(FakeSettings(**settings)), "/dev/null", 115200, 1)
+	# swallow the connect banner
+	while printer.outgoing.qsize():
+		printer.readline()
+
+	# like OctoPrint's clear to send counter, up to ack_window lines may be
+	# written before waiting on the oldest one's ok
+	window = max(1, settings.get("ack_window", 1))
+	in_flight = collections.deque()
+	latency = Histogram()
+	start = time.time()
+	cpu_start = cpu_time()
+	for line in gcode_lines(count):
+		if len(in_flight) >= window:
+			wait_ok(printer, in_flight, latency)
+		in_flight.append(time.time())
+		printer.write(line.encode("ascii"))
+	while in_flight:
+		wait_ok(printer, in_flight, latency)
+	elapsed = time.time() - start
+	cpu = cpu_time() - cpu_start
+	printer.close()
+
+	l = latency.to_dict()
+	print("%-28s %9.0f %10.3f %10.3f %10.3f %12.1f %9d %9d" % (name, count / elapsed,
+		l["p50"] * 1000, l["p99"] * 1000, l["max"] * 1000, cpu / count * 1e6,
+		fake_gcodex3g.bot.overflows, fake_gcodex3g.bot.accepted))
+
+SCENARIOS = [
+	("unthrottled", dict(), dict(capacity=1000000, drain_rate=1e9)),
+	("unthrottled, writer thread", dict(threaded_writer=True), dict(capacity=1000000, drain_rate=1e9)),
+	("unthrottled, reader thread", dict(threaded_reader=True), dict(capacity=1000000, drain_rate=1e9)),
+	("unthrottled, window 8", dict(ack_window=8), dict(capacity=1000000, drain_rate=1e9)),
+	("unthrottled, coalesce", dict(coalesce_tolerance=0.01), dict(capacity=1000000, drain_rate=1e9)),
+	("bot draining 500/s", dict(), dict(capacity=16, drain_rate=500)),
+	("bot draining 500/s, writer", dict(threaded_writer=True), dict(capacity=16, drain_rate=500)),
+	("bot draining 500/s, window 8", dict(ack_window=8), dict(capacity=16, drain_rate=500)),
+	("bot draining 500/s, coalesce", dict(coalesce_tolerance=0.01), dict(capacity=16, drain_rate=500)),
+	("bot draining 60/s", dict(), dict(capacity=16, drain_rate=60)),
+	("timeout every 500", dict(), dict(capacity=1000000, drain_rate=1e9, timeout_every=500)),
+	]
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark the GpxPrinter send/ack path")
+	parser.add_argument("-n", "--lines", type=int, default=2000, help="lines per scenario")
+	parser.add_argument("-k", "--filter", default=None, help="only run scenarios containing this text")
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.WARNING)
+	print("%-28s %9s %10s %10s %10s %12s %9s %9s" % ("scenario", "lines/s", "p50 ms", "p99 ms", "max ms", "cpu us/line", "overflows", "packets"))
+	for name, settings, bot in SCENARIOS:
+		if args.filter and args.filter not in name:
+			continue
+		count = args.lines
+		if bot.get("drain_rate", 0) < 1000:
+			# keep the throttled runs to a few seconds
+			count = min(count, int(bot["drain_rate"] * 3))
+		if bot.get("timeout_every"):
+			# each timeout costs a one second retry
+			count = min(count, bot["timeout_every"] * 3)
+		run(name, count, settings, bot)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,90 @@
+# coding=utf-8
+from __future__ import absolute_import, print_function
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Per line cost of classifying what OctoPrint sends: the queuing hook's M73
+# check plus the strip and line number check in GpxPrinter.write, before
+# (regex and decode) and after (octoprint_GPX.lineparse).
+#
+#     python benchmarks/bench_lineparse.py [-n LINES]
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# import the module directly, the package pulls in OctoPrint
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "octoprint_GPX"))
+from lineparse import has_line_number, m73_percent
+
+def make_file(path, count):
+	with open(path, "w") as f:
+		for i in range(count):
+			if i % 1000 == 0:
+				f.write("M73 P%d\n" % (i * 100 // count))
+			elif i % 50 == 0:
+				f.write("M105\n")
+			else:
+				f.write("G1 X%.3f Y%.3f E%.5f\n" % ((i % 200) * 0.1, (i % 170) * 0.1, i * 0.001))
+
+def load(path):
+	# (queued command, line as sent with line number and checksum)
+	lines = []
+	with open(path) as f:
+		for i, cmd in enumerate(f):
+			cmd = cmd.strip()
+			sent = cmd if cmd == "M105" else "N%d %s*42" % (i, cmd)
+			lines.append((cmd, (sent + "\n").encode("ascii")))
+	return lines
+
+def before(lines):
+	regex_m73 = re.compile("N(\d+) M73 P(\d+)")
+	regex_linenumber = re.compile("N(\d+)")
+	for cmd, data in lines:
+		match = regex_m73.match(cmd)
+		if match is not None:
+			int(match.group(2))
+		data = data.strip()
+		str_data = data
+		if not isinstance(str_data, str):
+			str_data = data.decode('utf-8')
+		regex_linenumber.match(str_data)
+
+def after(lines):
+	for cmd, data in lines:
+		m73_percent(cmd)
+		data = data.strip()
+		has_line_number(data)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark per line classification")
+	parser.add_argument("-n", "--lines", type=int, default=1000000)
+	args = parser.parse_args(argv)
+
+	fd, path = tempfile.mkstemp(suffix=".gcode")
+	os.close(fd)
+	try:
+		make_file(path, args.lines)
+		lines = load(path)
+	finally:
+		os.remove(path)
+
+	results = {}
+	for name, fn in [("before", before), ("after", after)]:
+		best = None
+		for i in range(3):
+			start = time.time()
+			fn(lines)
+			elapsed = time.time() - start
+			best = elapsed if best is None else min(best, elapsed)
+		results[name] = best
+		print("%-8s %8.3f secs %8.1f ns/line" % (name, best, best / len(lines) * 1e9))
+	print("speedup  %8.2fx" % (results["before"] / results["after"]))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,88 @@
+# coding=utf-8
+from __future__ import absolute_import, print_function
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Checks that GpxPrinter's FlavorTracker translates every line under the same
+# flavor as the old switch-to-reprap-and-back-around-every-host-line code, and
+# counts how many calls into gpx it saves.  Exits non-zero on a mismatch.
+#
+#     python benchmarks/compare_flavor.py
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_gcodex3g
+fake_gcodex3g.install()
+gpx = fake_gcodex3g
+
+from octoprint_GPX import gpxprinter
+from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+
+def mixed_lines(count, seed=1):
+	rng = random.Random(seed)
+	lineno = 0
+	for i in range(count):
+		r = rng.random()
+		if r < 0.1:
+			yield "M105"
+		elif r < 0.15:
+			# a run of host commands, like a manual jog
+			yield "G91"
+			yield "G1 X10 F3000"
+			yield "G90"
+		else:
+			lineno += 1
+			yield "N%d G1 X%d E%d*0" % (lineno, i % 100, i)
+
+# the original GpxPrinter.write flavor handling
+def reference(lines, base):
+	gpx.connect(None, 115200, None, None)
+	gpx.reprap_flavor(base)
+	gpx.bot.flavor_calls = 0
+	for line in lines:
+		numbered = line.startswith("N")
+		if not numbered:
+			save = gpx.reprap_flavor(True)
+		try:
+			gpx.write(line)
+		finally:
+			if not numbered:
+				gpx.reprap_flavor(save)
+	return list(gpx.bot.translated), gpx.bot.flavor_calls
+
+def tracked(lines, base):
+	printer = gpxprinter.GpxPrinter(FakePlugin(FakeSettings()), "/dev/null", 115200, 1)
+	gpx.reprap_flavor(base)
+	gpx.bot.flavor_calls = 0
+	for line in lines:
+		printer.write(line.encode("ascii"))
+	translated = list(gpx.bot.translated)
+	printer.close()
+	return translated, gpx.bot.flavor_calls
+
+def main():
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	lines = list(mixed_lines(20000))
+	failed = False
+	for base in (False, True):
+		expected, expected_switches = reference(lines, base)
+		actual, switches = tracked(lines, base)
+		if expected != actual:
+			for i, (e, a) in enumerate(zip(expected, actual)):
+				if e != a:
+					print("base reprap=%s: line %d translated as %r, expected %r" % (base, i, a, e))
+					break
+			else:
+				print("base reprap=%s: %d lines translated, expected %d" % (base, len(actual), len(expected)))
+			failed = True
+		else:
+			print("base reprap=%s: %d lines identical, reprap_flavor calls %d -> %d" % (base,
+				len(actual), expected_switches, switches))
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,160 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# A pure python stand-in for the gcodex3g extension that simulates the bot's
+# command buffer so the GpxPrinter hot path can be exercised on a laptop.
+#
+# The buffer holds `capacity` commands and the bot drains `drain_rate` of them
+# per second.  A write that finds the buffer full raises BufferOverflow just
+# like the real thing.  `timeout_every` makes every Nth write raise Timeout
+# once, `cancel_after` raises CancelBuild after that many commands.
+#
+# Install it with install() before importing octoprint_GPX.gpxprinter.
+
+import sys
+import threading
+import time
+
+class BufferOverflow(Exception):
+	pass
+
+class Timeout(Exception):
+	pass
+
+class CancelBuild(Exception):
+	pass
+
+class UnknownFirmware(Exception):
+	pass
+
+class _Bot():
+	def __init__(self):
+		self.configure()
+
+	def configure(self, capacity=16, drain_rate=200.0, write_cost=0.0, timeout_every=0, cancel_after=0):
+		self.capacity = capacity
+		self.drain_rate = drain_rate
+		self.write_cost = write_cost
+		self.timeout_every = timeout_every
+		self.cancel_after = cancel_after
+		self.reset()
+
+	def reset(self):
+		self.lock = threading.Lock()
+		self.level = 0.0
+		self.last = time.time()
+		self.writes = 0
+		self.accepted = 0
+		self.overflows = 0
+		self.timeouts = 0
+		self.aborts = 0
+		self.reprap = False
+		self.flavor_calls = 0
+		self.translated = []
+		self.connected = False
+		self.started = False
+
+	def drain(self):
+		now = time.time()
+		self.level = max(0.0, self.level - (now - self.last) * self.drain_rate)
+		self.last = now
+
+bot = _Bot()
+configure = bot.configure
+
+def connect(port, baudrate, inifile, logfile, verbose=False):
+	bot.reset()
+	bot.connected = True
+	return "start\nok"
+
+def start():
+	bot.started = True
+	return "ok"
+
+def disconnect():
+	bot.connected = False
+
+def set_baudrate(baudrate):
+	if baudrate not in (57600, 115200, 250000):
+		raise ValueError("Unsupported baudrate")
+
+def reprap_flavor(reprap):
+	previous = bot.reprap
+	bot.flavor_calls += 1
+	bot.reprap = reprap
+	return previous
+
+def _busy(seconds):
+	if seconds:
+		end = time.time() + seconds
+		while time.time() < end:
+			pass
+
+def write(line):
+	if not isinstance(line, str):
+		line = line.decode("utf-8")
+	with bot.lock:
+		bot.writes += 1
+		if bot.timeout_every and bot.writes % bot.timeout_every == 0:
+			bot.timeouts += 1
+			raise Timeout()
+		if bot.cancel_after and bot.accepted >= bot.cancel_after:
+			raise CancelBuild()
+		_busy(bot.write_cost)
+		words = line.split()
+		if words and words[0].startswith("N"):
+			words = words[1:]
+		command = words[0] if words else ""
+		if command == "M105":
+			return "ok T:210.0 /210.0 B:60.0 /60.0"
+		if command == "M112":
+			# abort immediately is a query, it doesn't wait for buffer space
+			bot.level = 0.0
+			bot.aborts += 1
+			return "ok"
+		if command[:1] in ("G", "M", "T"):
+			bot.drain()
+			if bot.level + 1 > bot.capacity:
+				bot.overflows += 1
+				raise BufferOverflow()
+			bot.level += 1
+		bot.accepted += 1
+		bot.translated.append((bot.reprap, line))
+		return "ok"
+
+def readnext():
+	return ""
+
+def waiting():
+	return False
+
+def listing_files():
+	return False
+
+def build_started():
+	return bot.started
+
+def build_paused():
+	return False
+
+def reset_ini():
+	pass
+
+def read_ini(path):
+	pass
+
+def get_machine_defaults(machineid):
+	if machineid not in ("r1", "r1d", "r2", "r2h", "r2x", "fcp"):
+		raise ValueError("Unknown machine id")
+	return dict(machine=dict(nozzle_diameter=0.4, extruder_count=2, timeout=20))
+
+def read_eeprom(eepromid):
+	raise UnknownFirmware()
+
+def write_eeprom(eepromid, value):
+	raise UnknownFirmware()
+
+def install():
+	sys.modules["gcodex3g"] = sys.modules[__name__]
@@ -0,0 +1,26 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# The worker process side of octoprint_GPX.gpxproxy.  It lives outside the
+# plugin package so that starting a worker only imports gcodex3g and not the
+# plugin (and with it flask and OctoPrint's server) all over again.
+
+def serve(conn):
+	import gcodex3g
+	while True:
+		try:
+			request = conn.recv()
+		except EOFError:
+			break
+		if request is None:
+			break
+		name, args = request
+		try:
+			value = getattr(gcodex3g, name)
+			if callable(value):
+				value = value(*args)
+			conn.send((True, value))
+		except Exception as e:
+			conn.send((False, (e.__class__.__name__, str(e))))
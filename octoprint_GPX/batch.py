@@ -0,0 +1,101 @@
+# coding=utf-8
+from __future__ import absolute_import, print_function
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# gpx-batch: translate a whole library of gcode files to x3g with the same
+# gpx.ini and machine definition overrides the plugin uses, in parallel
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from .iniparser import IniParser
+from . import translate
+
+GCODE_EXTENSIONS = (".gcode", ".gco", ".g")
+
+def _find_gcode(paths):
+	for path in paths:
+		if os.path.isdir(path):
+			for dirname, _, files in os.walk(path):
+				for name in sorted(files):
+					if name.lower().endswith(GCODE_EXTENSIONS):
+						yield os.path.join(dirname, name), os.path.relpath(os.path.join(dirname, name), path)
+		else:
+			yield path, os.path.basename(path)
+
+def _translate_one(job):
+	gpx_exe, ini, infile, outfile = job
+	try:
+		elapsed = translate.translate(gpx_exe, ini, infile, outfile)
+		return infile, os.path.getsize(infile), elapsed, None
+	except Exception as e:
+		return infile, 0, 0, str(e)
+
+def main(argv=None):
+	default_data_folder = os.path.join(os.path.expanduser("~"), ".octoprint", "data", "GPX")
+	parser = argparse.ArgumentParser(prog="gpx-batch",
+		description="Translate gcode files to x3g using the OctoPrint-GPX settings.")
+	parser.add_argument("paths", nargs="+", help="gcode files or folders to translate")
+	parser.add_argument("-d", "--data-folder", default=default_data_folder,
+		help="GPX plugin data folder containing gpx.ini (default: %(default)s)")
+	parser.add_argument("-o", "--output", default=None,
+		help="folder for the x3g files (default: next to each gcode file)")
+	parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(),
+		help="number of files to translate at once (default: %(default)s)")
+	parser.add_argument("--gpx", default=None,
+		help="path to the gpx command line tool (default: search the PATH)")
+	args = parser.parse_args(argv)
+
+	logger = logging.getLogger("octoprint.plugins.GPX.batch")
+	profile = IniParser(os.path.join(args.data_folder, "gpx.ini"), logger)
+	if os.path.isfile(profile.filename):
+		profile.read()
+	else:
+		print("No gpx.ini in %s, using gpx defaults" % args.data_folder, file=sys.stderr)
+	machine_path = os.path.join(args.data_folder, translate.machine_type(profile) + ".ini")
+	ini = translate.effective_ini(profile.filename, machine_path)
+
+	gpx_exe = translate.find_gpx(args.gpx)
+	if gpx_exe is None:
+		print("Unable to find the gpx command line tool, use --gpx", file=sys.stderr)
+		return 2
+
+	jobs = []
+	for infile, relpath in _find_gcode(args.paths):
+		if args.output is None:
+			outfile = os.path.splitext(infile)[0] + ".x3g"
+		else:
+			outfile = os.path.join(args.output, os.path.splitext(relpath)[0] + ".x3g")
+		jobs.append((gpx_exe, ini, infile, outfile))
+	if not jobs:
+		print("No gcode files found", file=sys.stderr)
+		return 1
+
+	start = time.time()
+	total_bytes = 0
+	failures = 0
+	pool = multiprocessing.Pool(max(args.jobs, 1))
+	try:
+		for infile, size, elapsed, error in pool.imap_unordered(_translate_one, jobs):
+			if error is not None:
+				failures += 1
+				print("%s: FAILED %s" % (infile, error))
+				continue
+			total_bytes += size
+			rate = size / elapsed / 1024 if elapsed > 0 else 0.0
+			print("%s: %d KB in %.2f secs (%.0f KB/sec)" % (infile, size / 1024, elapsed, rate))
+	finally:
+		pool.close()
+		pool.join()
+	elapsed = time.time() - start
+	print("Translated %d of %d files, %d KB in %.2f secs (%.0f KB/sec)" % (len(jobs) - failures,
+		len(jobs), total_bytes / 1024, elapsed, total_bytes / elapsed / 1024 if elapsed > 0 else 0.0))
+	return 1 if failures else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
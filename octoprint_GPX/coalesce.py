@@ -0,0 +1,256 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Lookahead in front of gpx.write that merges runs of colinear (within a
+# tolerance in mm) G1 moves into one move.  Slicers tessellate curves into
+# thousands of tiny segments and each one costs a packet on the serial link
+# and a slot in the bot's planner; a straight run of them doesn't need to.
+#
+# A run is only extended while the feedrate is unchanged, every move goes
+# forward, every intermediate point stays within the tolerance of the merged
+# move and the extrusion per mm stays within _e_ratio_tolerance of the first
+# move's so the filament is laid down the same way.  Anything the tracker
+# doesn't understand ends the run and, if it might have moved the axes,
+# forgets the position until the gcode tells us again.
+
+import math
+
+PASS, HELD, MERGED = range(3)
+
+# commands that end a run but don't move anything
+_stationary = frozenset([
+	"G4", "G21", "G90", "G91", "M18", "M70", "M72", "M73", "M82", "M83", "M84",
+	"M104", "M105", "M106", "M107", "M109", "M110", "M117", "M126", "M127",
+	"M140", "M190", "M300"])
+
+_e_ratio_tolerance = 0.05
+_max_segments = 64
+
+def _checksum(line):
+	cs = 0
+	for c in line:
+		cs ^= ord(c)
+	return cs
+
+def _follows(number, previous):
+	try:
+		return int(number) == int(previous) + 1
+	except ValueError:
+		return False
+
+# (line number or None, command, {letter: value}) or None if we can't tell
+def _parse(line):
+	star = line.find("*")
+	if star >= 0:
+		line = line[:star]
+	semi = line.find(";")
+	if semi >= 0:
+		line = line[:semi]
+	words = line.split()
+	number = None
+	if words and words[0][:1] == "N":
+		number = words[0][1:]
+		words = words[1:]
+	if not words:
+		return None
+	params = {}
+	try:
+		for word in words[1:]:
+			params[word[0].upper()] = float(word[1:])
+	except (ValueError, IndexError):
+		return None
+	return number, words[0].upper(), params
+
+class SegmentCoalescer():
+	def __init__(self, tolerance):
+		self.tolerance = tolerance
+		self.reset()
+
+	# forget the position and drop any run that hasn't been sent
+	def reset(self):
+		self.x = self.y = self.z = self.e = None
+		self.relative = False
+		self.relative_e = False
+		self.metric = True
+		self._run = None
+
+	# Feed the next line OctoPrint wants sent.  Returns (line, action) where
+	# line is a run that has to be sent before anything else (or None) and
+	# action says what happened to this one: PASS means send it as usual,
+	# HELD means it started a new run and MERGED means it joined the current
+	# one.  Held and merged lines are the caller's to ack.
+	def feed(self, line):
+		if not isinstance(line, str):
+			line = line.decode("ascii", "replace")
+		parsed = _parse(line.strip())
+		if parsed is None:
+			self._forget()
+			return self.take(), PASS
+		number, command, params = parsed
+		if command != "G1":
+			flushed = self.take()
+			self._track(command, params)
+			return flushed, PASS
+
+		segment = self._segment(params)
+		if segment is None:
+			flushed = self.take()
+			self._move(params)
+			return flushed, PASS
+		if self._run is not None and self._extend(number, params, segment):
+			self._move(params)
+			return None, MERGED
+		flushed = self.take()
+		self._start(line.strip(), number, params, segment)
+		self._move(params)
+		return flushed, HELD
+
+	# the pending run as a single line, or None if there isn't one
+	def take(self):
+		run = self._run
+		if run is None:
+			return None
+		self._run = None
+		if run["segments"] == 1:
+			return run["line"]
+		words = ["G1", "X%.3f" % run["x"], "Y%.3f" % run["y"]]
+		if run["e"] is not None:
+			words.append("E%.5f" % run["e"])
+		if run["f"] is not None:
+			words.append("F%g" % run["f"])
+		line = " ".join(words)
+		if run["number"] is not None:
+			line = "N%s %s" % (run["number"], line)
+			line = "%s*%d" % (line, _checksum(line))
+		return line
+
+	def pending(self):
+		return self._run is not None
+
+	# (dx, dy, de) for a G1 we could merge or None
+	def _segment(self, params):
+		if self.relative or not self.metric or self.x is None or self.y is None:
+			return None
+		for letter in params:
+			if letter not in "XYZEF":
+				return None
+		if "Z" in params and params["Z"] != self.z:
+			return None
+		de = 0.0
+		if "E" in params:
+			if self.relative_e:
+				de = params["E"]
+			elif self.e is None:
+				return None
+			else:
+				de = params["E"] - self.e
+		dx = params.get("X", self.x) - self.x
+		dy = params.get("Y", self.y) - self.y
+		if dx == 0 and dy == 0:
+			return None
+		return dx, dy, de
+
+	def _start(self, line, number, params, segment):
+		dx, dy, de = segment
+		self._run = dict(
+			line=line,
+			number=number,
+			segments=1,
+			x0=self.x, y0=self.y,
+			x=self.x + dx, y=self.y + dy,
+			dx=dx, dy=dy,
+			points=[],
+			e=params.get("E"),
+			de=de,
+			ratio=de / math.hypot(dx, dy),
+			f=params.get("F"))
+
+	def _extend(self, number, params, segment):
+		run = self._run
+		dx, dy, de = segment
+		if run["segments"] >= _max_segments:
+			return False
+		# a merged numbered run goes out as the last line of the run, so only
+		# take consecutive lines to keep OctoPrint's resend bookkeeping intact
+		if (number is None) != (run["number"] is None):
+			return False
+		if number is not None and not _follows(number, run["number"]):
+			return False
+		if "F" in params and params["F"] != run["f"]:
+			return False
+		if dx * run["dx"] + dy * run["dy"] <= 0:
+			return False
+		ratio = de / math.hypot(dx, dy)
+		if abs(ratio - run["ratio"]) > _e_ratio_tolerance * abs(run["ratio"]):
+			return False
+
+		x = run["x"] + dx
+		y = run["y"] + dy
+		points = run["points"] + [(run["x"], run["y"])]
+		if not self._within(run["x0"], run["y0"], x, y, points):
+			return False
+		run["line"] = None
+		run["number"] = number
+		run["segments"] += 1
+		run["x"] = x
+		run["y"] = y
+		run["points"] = points
+		run["de"] += de
+		if "E" in params:
+			run["e"] = run["de"] if self.relative_e else params["E"]
+		return True
+
+	# every point is within tolerance of the segment from (x0, y0) to (x1, y1)
+	def _within(self, x0, y0, x1, y1, points):
+		dx = x1 - x0
+		dy = y1 - y0
+		length2 = dx * dx + dy * dy
+		for px, py in points:
+			t = ((px - x0) * dx + (py - y0) * dy) / length2
+			if t < 0 or t > 1:
+				return False
+			ex = x0 + t * dx - px
+			ey = y0 + t * dy - py
+			if ex * ex + ey * ey > self.tolerance * self.tolerance:
+				return False
+		return True
+
+	def _move(self, params):
+		for letter in "XYZE":
+			if letter not in params:
+				continue
+			value = params[letter]
+			relative = self.relative_e if letter == "E" else self.relative
+			current = getattr(self, letter.lower())
+			if relative:
+				value = None if current is None else current + value
+			setattr(self, letter.lower(), value)
+
+	def _track(self, command, params):
+		if command in ("G0", "G1"):
+			self._move(params)
+		elif command == "G92":
+			if not params:
+				self.x = self.y = self.z = self.e = 0.0
+			for letter in "XYZE":
+				if letter in params:
+					setattr(self, letter.lower(), params[letter])
+		elif command == "G90":
+			self.relative = False
+		elif command == "G91":
+			self.relative = True
+		elif command == "M82":
+			self.relative_e = False
+		elif command == "M83":
+			self.relative_e = True
+		elif command == "G20":
+			self.metric = False
+		elif command == "G21":
+			self.metric = True
+		elif command not in _stationary:
+			self._forget()
+
+	def _forget(self):
+		self.x = self.y = self.z = self.e = None
@@ -0,0 +1,35 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Lines OctoPrint generates itself (temperature polls, manual commands) are
+# reprap flavor while numbered lines from a file are whatever gpx.ini says.
+# Rather than switching to reprap and back around every host command, remember
+# which flavor gpx is in and only call into gpx when it has to change.
+class FlavorTracker():
+	def __init__(self, gpx):
+		self._gpx = gpx
+		self.switches = 0
+		self.invalidate()
+
+	# gpx went back to the gpx.ini flavor (reconnect, reset_ini, read_ini)
+	def invalidate(self):
+		self._saved = None
+		self._reprap = False
+
+	# about to send a line OctoPrint generated
+	def host(self):
+		if not self._reprap:
+			self._saved = self._gpx.reprap_flavor(True)
+			self._reprap = True
+			self.switches += 1
+
+	# about to send a line from the file, or anything else that should use
+	# the gpx.ini flavor
+	def stream(self):
+		# nothing to undo if gpx.ini is reprap flavor to begin with
+		if self._reprap and not self._saved:
+			self._gpx.reprap_flavor(self._saved)
+			self._reprap = False
+			self.switches += 1
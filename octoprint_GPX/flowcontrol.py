@@ -0,0 +1,80 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import time
+
+# Estimates how fast the bot drains its command buffer from what we've seen
+# it accept and refuse.  When gpx.write raises BufferOverflow the buffer is
+# full; every accepted command after that tells us something about how fast
+# the bot drains it.  Instead of sleeping a fixed 100ms on each overflow we
+# sleep for about one estimated drain interval and back off exponentially from
+# there if the bot still isn't ready (for example, it is heating up).
+class FlowControl():
+	def __init__(self, min_delay=0.005, max_delay=0.25, paused_delay=1.0, clock=time.time):
+		self.min_delay = min_delay
+		self.max_delay = max_delay
+		self.paused_delay = paused_delay
+		self._clock = clock
+		self.reset()
+
+	def reset(self):
+		now = self._clock()
+		self._started = now
+		self._stall_start = None
+		self._retries = 0
+		self._drain_interval = None
+		self.lines = 0
+		self.overflows = 0
+		self.stalled = 0.0
+
+	def _ewma(self, old, new, weight=0.2):
+		if old is None:
+			return new
+		return old + weight * (new - old)
+
+	# the bot accepted a command
+	def accepted(self):
+		now = self._clock()
+		if self._stall_start is not None:
+			stall = now - self._stall_start
+			self.stalled += stall
+			# the bot had to make room for exactly one command; if the first
+			# retry got in, there was probably room sooner than we looked so
+			# guess low to keep the estimate from only ever growing
+			if self._retries <= 1:
+				stall /= 2
+			self._drain_interval = self._ewma(self._drain_interval, max(stall, self.min_delay))
+			self._stall_start = None
+		self._retries = 0
+		self.lines += 1
+
+	# the bot refused a command because its buffer is full, returns the number
+	# of seconds to wait before trying again
+	def overflow(self, paused=False):
+		now = self._clock()
+		self.overflows += 1
+		if self._stall_start is None:
+			self._stall_start = now
+		self._retries += 1
+		if paused:
+			return self.paused_delay
+		delay = self._drain_interval or self.min_delay
+		delay *= 2 ** (self._retries - 1)
+		return min(max(delay, self.min_delay), self.max_delay)
+
+	def wait(self, paused=False):
+		time.sleep(self.overflow(paused))
+
+	def stats(self):
+		elapsed = self._clock() - self._started
+		stalled = self.stalled
+		if self._stall_start is not None:
+			stalled += self._clock() - self._stall_start
+		return dict(
+			lines=self.lines,
+			overflows=self.overflows,
+			lines_per_sec=self.lines / elapsed if elapsed > 0 else 0.0,
+			stalled_secs=stalled,
+			drain_interval=self._drain_interval)
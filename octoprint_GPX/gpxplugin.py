@@ -0,0 +1,726 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import re
+import copy
+import json
+from collections import OrderedDict
+
+import flask
+from flask import request, make_response
+from werkzeug.exceptions import BadRequest
+
+import octoprint.plugin
+from octoprint.events import Events
+from octoprint.filemanager import FileDestinations
+from octoprint.server import admin_permission
+
+from .lineparse import m73_percent
+from .gpxproxy import GpxProxy
+
+try:
+	import gcodex3g as gpx
+except:
+	pass
+
+# merges dict b into dict a, deeply
+def _merge_dict(a, b):
+	for key in b:
+		if key in a:
+			if isinstance(a[key], dict) and isinstance(b[key], dict):
+				_merge_dict(a[key], b[key])
+				continue
+		a[key] = b[key]
+	return a
+
+
+class GPXPlugin(
+		octoprint.plugin.StartupPlugin,
+		octoprint.plugin.ShutdownPlugin,
+		octoprint.plugin.TemplatePlugin,
+		octoprint.plugin.SettingsPlugin,
+		octoprint.plugin.EventHandlerPlugin,
+		octoprint.plugin.AssetPlugin,
+		octoprint.plugin.BlueprintPlugin,
+		octoprint.plugin.ProgressPlugin
+		):
+
+	def __init__(self):
+		self._initialized = False
+		self.override_progress = False
+		self.coalesce_tolerance = 0
+		self.printer = None
+		self._comm = None
+		self.warm_start = None
+
+	# internal initialize
+	# we do it this weird way because __init__ gets called before the injected
+	# properties but on_after_startup can be too late in the case of auto
+	# connect on startup in which case the serial_factory is called first
+	def _initialize(self):
+		if self._initialized:
+			return
+		self._initialized = True
+
+		# get the plugin data folder
+		old_data_folder = os.path.join(self._settings.global_get_basefolder("base"), "gpxProfiles")
+		data_folder = self.get_plugin_data_folder()
+		if os.path.isdir(old_data_folder):
+			# migrate old folder to new one
+			if os.path.isdir(data_folder) and len(os.listdir(data_folder)) > 0:
+				self._logger.warn("Both old ({old}) and new ({new}) data folders exist. Not migrating to avoid data loss.".format(
+					old=old_data_folder, new=data_folder))
+			else:
+				import shutil
+				if os.path.isdir(data_folder):
+					os.rmdir(data_folder)
+				shutil.move(old_data_folder, data_folder)
+		elif not os.path.isdir(data_folder):
+			os.makedirs(data_folder)
+
+		# parse the ini file
+		profile_path = os.path.join(data_folder, "gpx.ini")
+		from .iniparser import IniParser
+		self.iniparser = IniParser(profile_path, self._logger)
+		from .iniwriter import IniWriter
+		self.ini_writer = IniWriter(self._logger)
+		# gpx's builtin machine definitions never change, the JSON bodies of
+		# the machine and ini routes do when they're posted to
+		self._machine_defaults = {}
+		self._bodies = {}
+		self.override_progress = False
+		self.printer = None
+		from .translate import BackgroundTranslator
+		self.translator = BackgroundTranslator(self._logger)
+		from .portdiscovery import PortDiscovery
+		self.port_discovery = PortDiscovery(self._logger)
+		from .x3gcache import X3gCache
+		cache_size = self._settings.get_int(["x3g_cache_size"])
+		if cache_size is None or cache_size < 0:
+			cache_size = 256
+		self.x3g_cache = X3gCache(os.path.join(data_folder, "x3g"), cache_size * 1024 * 1024, self._logger)
+
+	# StartupPlugin
+	def on_after_startup(self, *args, **kwargs):
+		self._initialize()
+
+	# ShutdownPlugin
+	def on_shutdown(self, *args, **kwargs):
+		if self._initialized:
+			self.ini_writer.flush()
+
+	# Softwareupdate hook
+	def get_update_information(self, *args, **kwargs):
+		return dict(
+			gpx=dict(
+				displayName="GPX Plugin",
+				displayVersion=self._plugin_version,
+
+				# use github release method of version check
+				type="github_release",
+				user="markwal",
+				repo="OctoPrint-GPX",
+				current=self._plugin_version,
+				prerelease=self._settings.get_boolean(["prerelease"]),
+
+				# update method: pip
+				pip="https://github.com/markwal/OctoPrint-GPX/releases/download/{target_version}/OctoPrint-GPX.tar.gz"
+			)
+		)
+
+	# main serial connection hook
+	def serial_factory(self, comm, port, baudrate, timeout, *args, **kwargs):
+		if not self._settings.get_boolean(["enabled"]) or port == 'VIRTUAL':
+			return None
+		self._initialize()
+		self.ini_writer.flush()
+		self.iniparser.read()
+		self.override_progress = self.iniparser.get("printer", "build_progress")
+		if self.override_progress is None:
+			self.override_progress = True
+		# merge G1 runs that stay this close (mm) to a straight line, 0 to
+		# send every move as is
+		self.coalesce_tolerance = self._settings.get_float(["coalesce_tolerance"])
+		if self.coalesce_tolerance is None or self.coalesce_tolerance < 0:
+			self.coalesce_tolerance = 0
+		self._logger.info("Connecting through x3g.")
+		try:
+			if port is None or port == 'AUTO':
+				discovered = self.port_discovery.discover()
+				if discovered is not None:
+					port = discovered
+			if not baudrate:
+				baudrate = 115200
+			if port is None or port == 'AUTO' or baudrate is None or baudrate == 0:
+				raise IOError("GPX plugin not able to discover AUTO port and/or baudrate. Please choose specific values for them.")
+			from .gpxprinter import GpxPrinter
+			self.printer = GpxPrinter(self, port, baudrate, timeout)
+			self._comm = comm
+
+			# it's easier to keep the counter straight if we ack every line
+			if comm is not None and getattr(comm, "_unknownCommandsNeedAck", None) is not None:
+			    comm._unknownCommandsNeedAck = True
+			else:
+			    self._logger.warn("comm object doesn't have _unknownCommandsNeedAck")
+
+			return self.printer
+		except Exception as e:
+			self._logger.info("Failed to connect to x3g e = %s." % e);
+			raise
+
+	# add x3g/s3g too the allowed extensions
+	def get_extension_tree(self, *args, **kwargs):
+		return dict(
+			machinecode=dict(
+				x3g=["x3g", "s3g"]
+			)
+		)
+
+	# SettingsPlugin
+	def get_settings_defaults(self, *args, **kwargs):
+		return dict(
+				enabled=True,
+				prerelease=False,
+				verbose=False,
+				connection_pause=2.0,
+				clear_coords_on_print_start=True,
+				threaded_writer=False,
+				writer_queue_size=32,
+				threaded_reader=False,
+				reader_poll_interval=0.5,
+				pretranslate=False,
+				gpx_path="",
+				x3g_cache_size=256,
+				progress_interval=5.0,
+				temperature_cache=False,
+				temperature_poll_interval=2.0,
+				temperature_max_age=10.0,
+				fast_connect=False,
+				translator_subprocess=False,
+				ack_window=1,
+				coalesce_tolerance=0.0,
+				warm_start=False)
+
+	def on_settings_save(self, data, *args, **kwargs):
+		# do the super, see https://thingspython.wordpress.com/2010/09/27/another-super-wrinkle-raising-typeerror
+		# and also foosel/OctoPrint@633d1ae594
+		octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
+		try:
+			self._settings.set_float(["connection_pause"], float(self._settings.get(["connection_pause"])))
+		except TypeError:
+			self._settings.set_float(["connection_pause"], 2.0)
+		if self.printer is not None:
+			# gpx reads the file itself
+			self.ini_writer.flush()
+			self.printer.refresh_ini()
+
+	# EventHandlerPlugin
+	def on_event(self, event, payload, *args, **kwargs):
+		# normally OctoPrint will merely stop sending commands on a cancel this
+		# means that whatever is in the printer's queue will complete including
+		# ten minutes to heat up the print bed; we circumvent here by telling
+		# the bot to stop
+		if event == Events.PRINT_CANCELLED:
+			if self.printer is not None:
+				# jump the queue with an abort
+				self.printer.cancel()
+
+		if event == getattr(Events, "FILE_ADDED", None):
+			if payload.get("storage") == FileDestinations.LOCAL and self._settings.get_boolean(["pretranslate"]):
+				path = payload.get("path")
+				if path is not None and "gcode" in payload.get("type", []):
+					self._initialize()
+					self.translator.submit(self.pretranslate, path)
+
+		if event == Events.FILE_SELECTED:
+			self._stop_warming()
+			if payload.get("origin") == FileDestinations.LOCAL and self._settings.get_boolean(["warm_start"]):
+				self._initialize()
+				self._start_warming(payload.get("path"))
+		elif event == Events.FILE_DESELECTED:
+			self._stop_warming()
+
+		if self.printer is not None:
+			if event == Events.CONNECTED:
+				self.printer.open_ack_window(self._comm)
+			elif event == Events.PRINT_STARTED:
+				if self.printer.is_streaming():
+					# every line of it would be dropped
+					self._echo("x3g stream in progress, cancelling the print")
+					self._printer.cancel_print()
+					return
+				self.printer.reset_stats()
+			elif event in (Events.PRINT_DONE, Events.PRINT_FAILED, Events.PRINT_CANCELLED):
+				# anything held back during the print
+				self.printer.refresh_ini()
+				self._logger.info("Flow control: %(lines)d lines at %(lines_per_sec).1f lines/sec, stalled %(stalled_secs).1f secs on %(overflows)d buffer overflows" % self.printer.flow.stats())
+				if self.coalesce_tolerance > 0:
+					self._logger.info("Coalesced %d moves, %.1f%% fewer packets" % (self.printer.stats.coalesced, self.printer.stats.packet_reduction() * 100))
+				if self._settings.get_boolean(["pretranslate"]):
+					self._logger.info("x3g cache: %(hits)d hits, %(misses)d misses, %(entries)d entries, %(bytes)d bytes" % self.x3g_cache.stats())
+
+	# Start every heater the selected job uses heating now rather than when
+	# its start gcode gets around to each of them and get the x3g ready while
+	# we're waiting
+	def _start_warming(self, path):
+		from .warmstart import WarmStart, scan_heat_targets, heat_commands
+		if path is None:
+			return
+		gcode_path = self._file_manager.path_on_disk(FileDestinations.LOCAL, path)
+		try:
+			self.ini_writer.flush()
+			self.iniparser.read()
+			flavor = self.iniparser.get("printer", "gcode_flavor")
+		except IOError:
+			flavor = None
+		try:
+			targets = scan_heat_targets(gcode_path, flavor)
+		except IOError as e:
+			self._logger.warn("Unable to read %s for warm start: %s" % (path, e))
+			return
+		self.warm_start = WarmStart(path, targets, flavor)
+		if not self.warm_start.empty() and self.printer is not None and not self._printer.is_printing():
+			commands = heat_commands(targets)
+			if self.printer.preheat(commands):
+				self.warm_start.preheated = True
+				self._logger.info("Warm start for %s: %s" % (path, ", ".join(commands)))
+		if self._settings.get_boolean(["pretranslate"]):
+			self.translator.submit(self.pretranslate, path)
+
+	# turn off the heaters warm start turned on if the job never got to them
+	def _stop_warming(self):
+		from .warmstart import cool_commands
+		warm_start = self.warm_start
+		self.warm_start = None
+		if warm_start is None or not warm_start.preheated:
+			return
+		if self.printer is not None and not self._printer.is_printing():
+			commands = cool_commands(warm_start.targets)
+			if self.printer.preheat(commands):
+				self._logger.info("Warm start for %s cancelled: %s" % (warm_start.path, ", ".join(commands)))
+
+	# ProgressPlugin
+	def on_print_progress(self, storage, path, progress, *args, **kwargs):
+		# override progress inside GPX only works in two pass (offline file)
+		# attempt to override here with OctoPrint's notion
+		# avoid 100% since that triggers end_build and we'll let that happen
+		# explicitly
+		if progress < 100 and self.override_progress and self.printer is not None:
+			self.printer.progress(progress)
+
+	# translate an uploaded gcode file to x3g ahead of time into the x3g
+	# cache, this runs on the background translator thread. Returns the path
+	# to the cached x3g. Only /x3g/print streams from the cache, a print
+	# OctoPrint starts is translated line by line as always.
+	def pretranslate(self, path):
+		from .iniparser import IniParser
+		from . import translate
+		from .x3gcache import hash_text
+		gcode_path = self._file_manager.path_on_disk(FileDestinations.LOCAL, path)
+		self.ini_writer.flush()
+		profile = IniParser(self.iniparser.filename, self._logger)
+		if os.path.isfile(profile.filename):
+			profile.read()
+		machineid = translate.machine_type(profile)
+		machine_path = os.path.join(self.get_plugin_data_folder(), machineid + ".ini")
+		ini = translate.effective_ini(profile.filename, machine_path)
+		try:
+			machine = json.dumps(self.fetch_machine(machineid), sort_keys=True)
+		except ValueError:
+			# gpx doesn't know the machine, the translation will say so
+			machine = machineid
+		key = self.x3g_cache.key(gcode_path, hash_text(ini + machine))
+		x3g_path = self.x3g_cache.get(key)
+		if x3g_path is not None:
+			self._logger.info("Found %s in the x3g cache" % path)
+			return x3g_path
+
+		x3g_path = self.x3g_cache.path(key)
+		gpx_exe = translate.find_gpx(self._settings.get(["gpx_path"]))
+		elapsed = translate.translate(gpx_exe, ini, gcode_path, x3g_path, background=True)
+		self.x3g_cache.added(key)
+		self._logger.info("Translated %s to x3g in %.1f secs" % (path, elapsed))
+		return x3g_path
+
+	# gcode queuing hook
+	def gcode_queuing(self, comm, phase, cmd, cmd_type, gcode, *args, **kwargs):
+		if self.warm_start is not None and gcode in self.warm_start.waits:
+			return self.combine_waits(cmd)
+		return self.rewrite_m73(comm, phase, cmd, cmd_type, gcode, *args, **kwargs)
+
+	# the first heater wait of a warm started job sets every heater's target
+	# first so the bot heats them all while it waits instead of one by one
+	def combine_waits(self, cmd):
+		warm_start = self.warm_start
+		if warm_start is None or warm_start.combined or warm_start.empty() or not self._printer.is_printing():
+			return None
+		return warm_start.combine(cmd)
+
+	def rewrite_m73(self, comm, phase, cmd, cmd_type, gcode, *args, **kwargs):
+		# if we're overriding progress and we got an M73 with a P between
+		# 0 and 100 exclusive.  We let the 0 and 100 through because they're
+		# the begin and end markers
+		if self.override_progress:
+			progress = m73_percent(cmd)
+			if progress is not None and progress > 0 and progress < 100:
+				return None,
+		return None
+
+	# protocol script hook
+	def gcode_scripts(self, comm, script_type, script_name, *args, **kwargs):
+		if script_type == "gcode":
+			if script_name == "afterPrintCancelled":
+				return "(@clear_cancel)", None
+			if script_name == "beforePrintStarted":
+				self.printer.clear_bot_cancelled()
+				# the job takes the heaters over from here, this runs before
+				# the job's first line is queued where PRINT_STARTED may not
+				warm_start = self.warm_start
+				if warm_start is not None:
+					warm_start.combined = False
+					warm_start.preheated = False
+				currentJob = self._printer.get_current_job()
+				try:
+					build_name = currentJob["file"]["name"]
+					build_name = os.path.splitext(os.path.basename(build_name))[0] if build_name else "OctoPrint"
+				except KeyError:
+					build_name = "OctoPrint"
+				clear_coords = ""
+				if self._settings.get_boolean(["clear_coords_on_print_start"]):
+					clear_coords="\nG92 X0 Y0 Z0 A0 B0"
+				return '(@build "{build_name}")\nM136 ({build_name}){clear_coords}'.format(build_name=build_name, clear_coords=clear_coords), None
+		return None
+
+	# AssetPlugin
+	def get_assets(self, *args, **kwargs):
+		return dict(
+			js=["js/gpx.js"],
+			css=["css/gpx.css"],
+			less=["less/gpx.less"]
+		)
+
+	# machine ini handling
+	def fetch_machine_ini(self, machineid):
+		data_folder = self.get_plugin_data_folder()
+		profile_path = os.path.join(data_folder, machineid + ".ini")
+		machine_ini = self.ini_writer.pending(profile_path)
+		if machine_ini is not None:
+			return machine_ini
+		from .iniparser import IniParser
+		machine_ini = IniParser(profile_path, self._logger)
+		if os.path.isdir(data_folder) and os.path.exists(profile_path) and os.path.isfile(profile_path):
+			try:
+				machine_ini.read()
+				self._logger.info("Read machine definition from %s" % profile_path)
+			except IOError:
+				self._logger.warn("Unable to read custom machine definition %s" % profile_path)
+		return machine_ini
+
+	def fetch_machine_defaults(self, machineid):
+		machine = self._machine_defaults.get(machineid)
+		if machine is None:
+			machine = self._machine_defaults[machineid] = gpx.get_machine_defaults(machineid)
+		# callers merge into and massage what they get
+		return copy.deepcopy(machine)
+
+	def fetch_machine(self, machineid):
+		if gpx is None:
+			return None
+		machine = self.fetch_machine_defaults(machineid)
+		machine_ini = self.fetch_machine_ini(machineid)
+		# callers massage what they get, leave the parser's sections alone
+		return _merge_dict(machine, copy.deepcopy(machine_ini.ini))
+
+	# the JSON body for key (the file it comes from) at version, built by
+	# make on first use and kept until the file changes or the next post to
+	# the machine or ini routes
+	def _body(self, key, version, make):
+		cached = self._bodies.get(key)
+		if cached is not None and cached[0] == version:
+			return cached[1]
+		body = json.dumps(make(), sort_keys=True)
+		self._bodies[key] = (version, body)
+		return body
+
+	# body as JSON with a strong ETag or, if the client already has that,
+	# 304 Not Modified; no-cache so browsers always come back and ask
+	def _etag_response(self, body):
+		from .x3gcache import hash_text
+		etag = hash_text(body)
+		if request.if_none_match.contains(etag):
+			response = make_response("", 304)
+		else:
+			response = make_response(body)
+			response.headers["Content-Type"] = "application/json"
+		response.set_etag(etag)
+		response.headers["Cache-Control"] = "no-cache"
+		return response
+
+	def validate_machineid(self, machineid):
+		if len(machineid) > 8 or not re.match('[a-zA-z0-9]+$', machineid):
+			return make_response("Invalid machineid. Upper or lower case letters and numbers only and 8 chars or less")
+		return None
+
+	# BlueprintPlugin
+	@octoprint.plugin.BlueprintPlugin.route("/defaultmachine/<string:machineid>", methods=["GET"])
+	def defaultmachine(self, machineid, *args, **kwargs):
+		response = self.validate_machineid(machineid)
+		if response is not None:
+			return response
+		if gpx is None:
+			return None
+		try:
+			body = self._body(machineid, None,
+				lambda: self.ini_massage_out(self.fetch_machine_defaults(machineid)))
+		except ValueError:
+			return make_response("Unknown machine id: %s" % machineid, 404)
+		return self._etag_response(body)
+
+	@octoprint.plugin.BlueprintPlugin.route("/machine/<string:machineid>", methods=["GET"])
+	def machine(self, machineid, *args, **kwargs):
+		response = self.validate_machineid(machineid)
+		if response is not None:
+			return response
+		try:
+			machine_ini = self.fetch_machine_ini(machineid)
+			body = self._body(machine_ini.filename, machine_ini.version,
+				lambda: self.ini_massage_out(self.fetch_machine(machineid)))
+		except ValueError:
+			return make_response("Unknown machine id: %s" % machineid, 404)
+		return self._etag_response(body)
+
+	@octoprint.plugin.BlueprintPlugin.route("/machine/<string:machineid>", methods=["POST"])
+	@admin_permission.require(403)
+	def putmachine(self, machineid, *args, **kwargs):
+		response = self.validate_machineid(machineid)
+		if response is not None:
+			return response
+		try:
+			machine_ini = self.fetch_machine_ini(machineid)
+		except ValueError:
+			return make_response("Unknown machine id: %s" % machineid, 404)
+		defaults = self.fetch_machine_defaults(machineid)
+		incoming = self.ini_massage_in(request.json)
+		for sectionname, section in incoming.items():
+			if sectionname in defaults:
+				for option, value in section.items():
+					if option in defaults[sectionname]:
+						if value == 'undefined':
+							incoming[sectionname][option] = ''
+							continue
+						t = type(defaults[sectionname][option])
+						try:
+							if t == float:
+								value = float(value)
+							elif t == int:
+								value = int(value)
+						except ValueError:
+							incoming[sectionname][option] = ''
+						if defaults[sectionname][option] == value:
+							# delete the option in the output so the builtin default
+							# will shine through
+							incoming[sectionname][option] = ''
+		self.ini_writer.update(machine_ini, incoming)
+		self._bodies.clear()
+		return ('', 200)
+
+	# Mostly the REST service here gives the ini file as specified by gpx
+	# including 1 and 0 for boolean true and false whether it is usual or makes
+	# semantic sense or not.  An exception is has_heated_build_platform: gpx.ini
+	# wants it per toolhead, but we present it per machine in the API.
+	def ini_massage_out(self, ini):
+		heated = False
+		if "a" in ini and "has_heated_build_platform" in ini["a"]:
+			if "machine" not in ini:
+				ini["machine"] = OrderedDict()
+			heated = ini["machine"]["has_heated_build_platform"] = ini["a"]["has_heated_build_platform"]
+			del ini["a"]["has_heated_build_platform"]
+		if "b" in ini and ini["b"].get("has_heated_build_platform"):
+			if "machine" not in ini:
+				ini["machine"] = OrderedDict()
+			ini["machine"]["has_heated_build_platform"] = heated or ini["b"]["has_heated_build_platform"]
+			del ini["b"]["has_heated_build_platform"]
+		return ini
+
+	def ini_massage_in(self, ini):
+		if "machine" in ini and "has_heated_build_platform" in ini["machine"]:
+			if "a" not in ini:
+				ini["a"] = {}
+			if "b" not in ini:
+				ini["b"] = {}
+			ini["a"]["has_heated_build_platform"] = ini["b"]["has_heated_build_platform"] = ini["machine"]["has_heated_build_platform"]
+			del ini["machine"]["has_heated_build_platform"]
+		# Sort the input. Only effects the updated properties that are new,
+		# which will then be appended in sorted order. Existing properties will
+		# update in-place.
+		ini = OrderedDict(sorted(ini.items()))
+		for sectionname, section in ini.items():
+			ini[sectionname] = OrderedDict(sorted(section.items()))
+		return ini
+
+	@octoprint.plugin.BlueprintPlugin.route("/ini", methods=["GET"])
+	def ini(self, *args, **kwargs):
+		try:
+			self.ini_writer.flush()
+			ini = self.iniparser.read()
+			version = self.iniparser.version
+		except IOError:
+			self._logger.info("Unable to read %s, using defaults." % self.iniparser.filename)
+			ini = OrderedDict()
+			ini["printer"] = OrderedDict()
+			ini["printer"]["machine_type"] = "r2"
+			version = None
+		return self._etag_response(self._body(self.iniparser.filename, version,
+			lambda: self.ini_massage_out(copy.deepcopy(ini))))
+
+	@octoprint.plugin.BlueprintPlugin.route("/ini", methods=["POST"])
+	@admin_permission.require(403)
+	def putini(self, *args, **kwargs):
+		self._logger.debug("putini")
+		if not "application/json" in request.headers["Content-Type"]:
+			return make_response("Expected content-type JSON", 400)
+		try:
+			ini = self.ini_massage_in(request.json)
+		except BadRequest:
+			return make_response("Malformed JSON body in request", 400)
+		self.ini_writer.update(self.iniparser, ini)
+		self._bodies.clear()
+		return ('', 200)
+
+	# the eeprom lives on the bot so ask whichever gpx is connected to it,
+	# through the printer when it is connected so the call holds its link
+	def _connected_gpx(self):
+		if self.printer is not None:
+			return self.printer
+		return gpx
+
+	def _check_for_json(self, request):
+		if not "Content-Type" in request.headers or not "application/json" in request.headers["Content-Type"]:
+			self._logger.debug("expected content-type application/json")
+			return make_response("Expected content-type application/json", 400)
+		try:
+			self._logger.debug("request body '%s'" % request.data)
+			json = request.json
+		except BadRequest:
+			self._logger.debug("Malformed JSON body in request")
+			return make_response("Malformed JSON body in request", 400)
+		return None
+
+	@octoprint.plugin.BlueprintPlugin.route("/stats", methods=["GET"])
+	def stats(self, *args, **kwargs):
+		stats = dict()
+		if self.printer is not None:
+			stats["printer"] = self.printer.get_stats()
+		if self._initialized:
+			stats["x3g_cache"] = self.x3g_cache.stats()
+		return flask.jsonify(stats)
+
+	# print a local x3g file (or the cached translation of a gcode file) by
+	# streaming its packets straight to the bot instead of through OctoPrint
+	@octoprint.plugin.BlueprintPlugin.route("/x3g/print", methods=["POST"])
+	@admin_permission.require(403)
+	def printx3g(self, *args, **kwargs):
+		response = self._check_for_json(request)
+		if response is not None:
+			return response
+		path = request.json.get("path")
+		if path is None or not self._file_manager.file_exists(FileDestinations.LOCAL, path):
+			return make_response("Unknown file: %s" % path, 404)
+		if self.printer is None or self._printer.is_printing() or self.printer.is_streaming():
+			return make_response("Printer is not connected through GPX or is busy", 409)
+		# translating can take minutes, so do it and start the stream on the
+		# translator thread and report how it went in the terminal
+		self._initialize()
+		self.translator.submit(self._print_x3g, path)
+		return ('', 202)
+
+	def _print_x3g(self, path):
+		from .translate import TranslationError
+		try:
+			if os.path.splitext(path)[1].lower() in [".x3g", ".s3g"]:
+				x3g_path = self._file_manager.path_on_disk(FileDestinations.LOCAL, path)
+			else:
+				x3g_path = self.pretranslate(path)
+			printer = self.printer
+			if printer is None:
+				self._logger.warn("Printer disconnected before %s could be streamed" % path)
+				return
+			printer.stream_x3g(x3g_path)
+		except TranslationError as e:
+			self._logger.warn("Unable to translate %s: %s" % (path, e))
+			self._echo("x3g stream failed, unable to translate %s: %s" % (path, e))
+		except (ValueError, IOError, OSError) as e:
+			# already streaming or the serial port wouldn't open
+			self._logger.warn("Unable to stream %s: %s" % (path, e))
+			self._echo("x3g stream failed for %s: %s" % (path, e))
+
+	def _echo(self, message):
+		if self.printer is not None:
+			self.printer.echo(message)
+
+	@octoprint.plugin.BlueprintPlugin.route("/x3g/cancel", methods=["POST"])
+	@admin_permission.require(403)
+	def cancelx3g(self, *args, **kwargs):
+		if self.printer is None or not self.printer.is_streaming():
+			return make_response("Not streaming x3g", 409)
+		self.printer.cancel()
+		return ('', 200)
+
+	@octoprint.plugin.BlueprintPlugin.route("/eeprombatch", methods=["POST"])
+	def batcheeprom(self, *args, **kwargs):
+		self._logger.info("batcheeprom")
+		response = self._check_for_json(request)
+		if response is not None:
+			return response
+
+		response = {}
+		for eepromid in request.json:
+			try:
+				response[eepromid] = self._connected_gpx().read_eeprom(eepromid)
+			except ValueError:
+				SELF._LOGGER.WARN("UNKNOWN EEPROM id %s" % eepromid)
+			except (gpx.UnknownFirmware, GpxProxy.UnknownFirmware):
+				self._logger.warn("Unrecognized firmware flavor or version.")
+				return make_response("Unrecognize firmware flavor or version", 400)
+		self._logger.debug("response = %s" % flask.jsonify(response))
+		return flask.jsonify(response)
+
+	@octoprint.plugin.BlueprintPlugin.route("/puteeprombatch", methods=["POST"])
+	def putbatcheeprom(self, *args, **kwargs):
+		self._logger.info("putbatcheeprom")
+		response = self._check_for_json(request)
+		if response is not None:
+			return response
+
+		response = {}
+		for eepromid in request.json:
+			try:
+				response[eepromid] = self._connected_gpx().write_eeprom(eepromid, request.json[eepromid])
+			except ValueError:
+				self._logger.warn("Unknown EEPROM id %s" % eepromid)
+		self._logger.debug("response = %s" % flask.jsonify(response))
+		return flask.jsonify(response)
+
+	@octoprint.plugin.BlueprintPlugin.route("/eeprom/<string:eepromid>", methods=["GET"])
+	def eeprom(self, eepromid, *args, **kwargs):
+		response = self.validate_eepromid(eepromid)
+		if response is not None:
+			return response
+		try:
+			value = self._connected_gpx().read_eeprom(eepromid)
+		except ValueError:
+			return make_response("Unknown eeprom id: %s" % eepromid, 404)
+		return flask.jsonify(value)
+
+	@octoprint.plugin.BlueprintPlugin.route("/eeprom/<string:eepromid>", methods=["POST"])
+	@admin_permission.require(403)
+	def puteeprom(self, eepromid, *args, **kwargs):
+		if not "Content-Type" in request.headers or not "application/json" in request.headers["Content-Type"]:
+			return make_response("Expected content-type JSON", 400)
+		try:
+			value = request.json
+		except BadRequest:
+			return make_response("Malformed JSON body in request", 400)
+		# TODO: set value
+		return ('', 200)
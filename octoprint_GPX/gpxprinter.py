@@ -10,17 +10,36 @@ try:
 	import queue
 except ImportError:
 	import Queue as queue
-import re
 import datetime
+import tempfile
+import threading
 
 from octoprint.filemanager import FileDestinations
 
+from .flowcontrol import FlowControl
+from .stats import PrintStats
+from .lineparse import has_line_number, is_z_move
+from .flavor import FlavorTracker
+from .responsebuffer import ResponseBuffer
+from .progress import ProgressUpdater
+from .temperature import TemperatureCache
+from .coalesce import SegmentCoalescer, PASS, MERGED
+from .iniparser import IniParser
+from .profilediff import ProfileDiff, profile
+
 gpx = False
 try:
 	import gcodex3g as gpx
 except:
 	pass
 
+# OctoPrint's temperature poll, as str or bytes
+_m105 = ("M105", b"M105")
+
+# when a gpx.ini change that arrived during a print gets applied
+_next_layer = "next layer"
+_print_end = "end of the print"
+
 class GpxPrinter():
 	def __init__(self, gpx_plugin, port = None, baudrate = None, timeout = 0):
 		self._logger = gpx_plugin._logger
@@ -30,31 +49,204 @@ class GpxPrinter():
 		if gpx is None:
 			self._logger.warn("Unable to import gpx module")
 			raise ValueError("Unable to import gpx module")
+		self._gpx = gpx
+		if self._settings.get_boolean(["translator_subprocess"]):
+			# host gcodex3g in a process of our own so its C calls run outside
+			# OctoPrint's GIL and a crash there can't take OctoPrint down
+			from .gpxproxy import GpxProxy
+			self._gpx = GpxProxy(self._logger)
 		self.port = port
 		self.baudrate = self._baudrate = baudrate
 		self.timeout = timeout
 		self._logger.info("GPXPrinter created, port: %s, baudrate: %s" % (self.port, self.baudrate))
-		self.outgoing = queue.Queue()
+		self.outgoing = ResponseBuffer()
 		self.baudrateError = False;
 		data_folder = gpx_plugin.get_plugin_data_folder()
 		self.profile_path = os.path.join(data_folder, "gpx.ini")
-		log_path = self._settings.get_plugin_logfile_path()
-		self._regex_linenumber = re.compile("N(\d+)")
+		self._log_path = self._settings.get_plugin_logfile_path()
+		self._writer = None
+		self._writer_error = None
+		self._reader = None
+		self._streamer = None
+		# gcodex3g isn't thread safe, every call into gpx from the writer,
+		# reader, poller and streamer threads or OctoPrint's comm thread holds
+		# the link.  It is only held for the call itself, never while waiting
+		# on a full buffer, so the other threads can still get at the bot.
+		self._link = threading.RLock()
+		# held by whoever is feeding OctoPrint's lines to gpx, for as long as
+		# it takes the bot to accept them, so they go out in order; take it
+		# before the link, never while holding it
+		self._sending = threading.RLock()
+		self._cancelling = threading.Event()
+		# set by close, a line still waiting on the bot is given up on
+		self._closing = threading.Event()
+		self._clear_to_send = None
+		self._reopen_window = False
+		self._temperatures = None
+		self._temperature_poller = None
+		self._applied = {}
+		self._profile_pending = None
+		self._last_write = 0
+		self.flow = FlowControl()
+		self.stats = PrintStats()
+		self.flavor = FlavorTracker(self._gpx)
+		progress_interval = self._settings.get_float(["progress_interval"])
+		if progress_interval is None or progress_interval < 0:
+			progress_interval = 5.0
+		self._progress = ProgressUpdater(self._send_progress, progress_interval)
+		self._coalescer = None
+		tolerance = getattr(gpx_plugin, "coalesce_tolerance", 0)
+		if tolerance > 0:
+			self._coalescer = SegmentCoalescer(tolerance)
 		try:
+			self._connect()
+		except Exception:
+			if self._gpx is not gpx:
+				self._gpx.close()
+			raise
+
+		# optionally hand gpx.write off to a dedicated writer thread so that
+		# the retry and backoff below doesn't block OctoPrint's comm thread;
+		# OctoPrint only feels backpressure when the send queue is full
+		# a window of more than one line in flight only helps if write doesn't
+		# wait for the bot, so it brings the writer thread along
+		self.ack_window = self._settings.get_int(["ack_window"])
+		if self.ack_window is None or self.ack_window < 1:
+			self.ack_window = 1
+		if self._settings.get_boolean(["threaded_writer"]) or self.ack_window > 1:
+			queue_size = self._settings.get_int(["writer_queue_size"])
+			if queue_size is None or queue_size < self.ack_window:
+				queue_size = self.ack_window
+			self._send_queue = queue.Queue(maxsize=queue_size)
+			self._writer = threading.Thread(target=self._writer_loop, name="GPX writer")
+			self._writer.daemon = True
+			self._writer.start()
+
+		# optionally poll the bot from a reader thread that pushes responses
+		# into outgoing as they arrive rather than only when readline times out
+		if self._settings.get_boolean(["threaded_reader"]):
+			self._reader_interval = self._settings.get_float(["reader_poll_interval"])
+			if self._reader_interval is None or self._reader_interval <= 0:
+				self._reader_interval = 0.5
+			self._reader_stop = threading.Event()
+			self._reader_wake = threading.Event()
+			self._reader = threading.Thread(target=self._reader_loop, name="GPX reader")
+			self._reader.daemon = True
+			self._reader.start()
+
+		# optionally answer OctoPrint's M105 polls from a cache that a poller
+		# refreshes whenever the link has been quiet for a bit
+		if self._settings.get_boolean(["temperature_cache"]):
+			self._temperature_interval = self._settings.get_float(["temperature_poll_interval"])
+			if self._temperature_interval is None or self._temperature_interval <= 0:
+				self._temperature_interval = 2.0
+			max_age = self._settings.get_float(["temperature_max_age"])
+			if max_age is None or max_age < 0:
+				max_age = 10.0
+			self._temperatures = TemperatureCache(max_age)
+			self._temperature_stop = threading.Event()
+			self._temperature_poller = threading.Thread(target=self._temperature_loop, name="GPX temperature poller")
+			self._temperature_poller.daemon = True
+			self._temperature_poller.start()
+
+	def _connect(self):
+		self.flavor.invalidate()
+		if self._temperatures is not None:
+			self._temperatures.invalidate()
+		try:
+			start = time.time()
 			self._logger.debug("Calling gpx.connect")
-			self._append(gpx.connect(port, baudrate, self.profile_path, log_path,
+			self._append(self._gpx.connect(self.port, self._baudrate, self.profile_path, self._log_path,
 				self._settings.get_boolean(["verbose"])))
-			time.sleep(float(self._settings.get(["connection_pause"])))
-			self._append(gpx.start())
-			self._logger.info("gpx.connect succeeded")
+			pause = float(self._settings.get(["connection_pause"]))
+			if self._settings.get_boolean(["fast_connect"]):
+				self._probe(pause)
+			else:
+				time.sleep(pause)
+			self._append(self._gpx.start())
+			self._logger.info("gpx.connect succeeded in %.2f secs" % (time.time() - start))
+			self._applied = self._read_profile()
+			self._profile_pending = None
 		except Exception as e:
 			self._logger.info("gpx.connect raised exception = %s" % e)
 			raise
 
+	# instead of always sleeping connection_pause seconds, ask the bot for its
+	# version every 100ms until it answers, giving up and carrying on as
+	# before once connection_pause has passed
+	def _probe(self, pause):
+		deadline = time.time() + pause
+		while True:
+			try:
+				self._gpx.write("M115")
+				return True
+			except (self._gpx.Timeout, self._gpx.BufferOverflow, IOError):
+				pass
+			remaining = deadline - time.time()
+			if remaining <= 0:
+				self._logger.info("Bot didn't answer within %.1f secs" % pause)
+				return False
+			time.sleep(min(0.1, remaining))
+
+	def _waiting(self):
+		waiting = self._gpx.waiting
+		return waiting() if callable(waiting) else waiting
+
+	def _read_profile(self):
+		try:
+			return profile(IniParser(self.profile_path, self._logger).read())
+		except IOError:
+			return {}
+
+	# bring gpx up to date with gpx.ini, during a print changes are held
+	# until the next layer or, if they could change the geometry, until the
+	# print is over
 	def refresh_ini(self):
-		if not self._printer.is_printing() and not self._printer.is_paused():
-			gpx.reset_ini()
-			gpx.read_ini(self.profile_path)
+		diff = ProfileDiff(self._applied, self._read_profile())
+		if not diff:
+			self._logger.debug("gpx.ini unchanged, not reloading")
+			return
+		if self._printer.is_printing() or self._printer.is_paused():
+			self._profile_pending = _next_layer if diff.safe_mid_print() else _print_end
+			self._logger.info("Holding gpx.ini changes until the %s" % self._profile_pending)
+			return
+		self._apply_profile()
+
+	# at a quiet moment on the link
+	def _apply_pending_profile(self):
+		pending = self._profile_pending
+		if pending is _next_layer or (pending is _print_end and
+				not self._printer.is_printing() and not self._printer.is_paused()):
+			self._apply_profile()
+
+	def _apply_profile(self):
+		with self._sending, self._link:
+			self._profile_pending = None
+			applied = self._read_profile()
+			diff = ProfileDiff(self._applied, applied)
+			if not diff:
+				return
+			if diff.needs_reset():
+				self._gpx.reset_ini()
+				self._gpx.read_ini(self.profile_path)
+				self.flavor.invalidate()
+			else:
+				# lay just the changed keys over the current settings, which
+				# leaves gpx in whatever flavor it was in so put it back in
+				# the gpx.ini flavor first
+				self.flavor.stream()
+				fd, path = tempfile.mkstemp(suffix=".ini")
+				try:
+					with os.fdopen(fd, "w") as f:
+						f.write(diff.ini_text())
+					self._gpx.read_ini(path)
+				finally:
+					os.remove(path)
+				if diff.changes("printer", "gcode_flavor"):
+					# and that flavor is now the new one
+					self.flavor.invalidate()
+			self._applied = applied
+			self._logger.info("Applied gpx.ini changes to %s" % ", ".join("[%s]%s" % key for key in diff.keys()))
 
 	def _bot_reports_build_cancelled(self):
 		# sometimes the bot tells us the build is cancelled because it wants us
@@ -73,126 +265,518 @@ class GpxPrinter():
 				self._bot_cancelled = True
 				self._printer.cancel_print()
 
+	# set heater targets outside of OctoPrint's command stream, the bot's
+	# answers aren't OctoPrint's so they aren't passed along
+	def preheat(self, commands):
+		with self._link:
+			if self._streamer is not None:
+				return False
+			self.flavor.host()
+			for command in commands:
+				try:
+					self._gpx.write(command)
+				except (self._gpx.BufferOverflow, self._gpx.Timeout) as e:
+					self._logger.warn("Unable to preheat with %s: %s" % (command, e.__class__.__name__))
+					return False
+		return True
+
 	def clear_bot_cancelled(self):
 		# called when a new print is started. We'll just assume the user knows
 		# what they're doing and the cancel has completed.
 		self._bot_cancelled = False
 
 	def progress(self, percent):
+		# coalesced and sent between lines by _send_progress
+		self._progress.update(percent)
+
+	def _send_progress(self, percent):
 		# we don't want the progress event to pre-empt the build start or
-        # override the build end notification and the M73 causes a build start
-        # if we aren't already running one
-		if gpx.build_started():
-			try:
-				# loop sending for a while if the queue isn't full or if the bot
-				# isn't listening
-				for i in range(0, 10):
-					try:
-						gpx.write("M73 P%d" % percent)
-						break
-					except gpx.BufferOverflow:
-						time.sleep(0.01)
-					except gpx.Timeout:
-						time.sleep(0.1)
-			except gpx.CancelBuild:
-				self._bot_reports_build_cancelled()
+		# override the build end notification and the M73 causes a build start
+		# if we aren't already running one
+		try:
+			with self._link:
+				if not self._gpx.build_started():
+					return True
+				self.flavor.stream()
+				self._gpx.write("M73 P%d" % percent)
+			self.stats.progress_updates += 1
+			return True
+		except (self._gpx.BufferOverflow, self._gpx.Timeout):
+			# try again at the next gap
+			return False
+		except self._gpx.CancelBuild:
+			self._bot_reports_build_cancelled()
+			return True
 
 	def _append(self, s):
-		if (s != ''):
-			for item in s.split('\n'):
-				self.outgoing.put(item)
+		self.outgoing.append(s)
 
 	def write(self, data):
+		if self._writer is None:
+			return self._write(data)
+
+		# surface any failure from the writer thread the same way the
+		# synchronous path would have: as an exception from write
+		error = self._writer_error
+		if error is not None:
+			self._writer_error = None
+			raise error
+		self._send_queue.put(data)
+		return len(data)
+
+	def _writer_loop(self):
+		while not self._closing.is_set():
+			data = self._send_queue.get()
+			if data is None:
+				break
+			try:
+				self._write(data)
+			except Exception as e:
+				self._logger.warn("GPX writer thread caught exception: %s" % e)
+				self._writer_error = e
+
+	def _write(self, data):
+		with self._sending:
+			if self._streamer is not None:
+				# the x3g streamer owns the serial port, keep OctoPrint's ack
+				# counting happy until it gives it back but say the line was
+				# dropped, other than the temperature polls
+				if data.strip() not in _m105:
+					self._append("// echo: x3g stream in progress, not sent: %s" % data.strip().decode("utf-8", "replace"))
+				self._append("ok")
+				return len(data)
+			if self._profile_pending is _next_layer and is_z_move(data):
+				# finish the old layer with the old settings
+				self._flush_segments()
+				self._apply_profile()
+			if self._temperatures is not None and data.strip() in _m105:
+				response = self._temperatures.get()
+				if response is not None:
+					self._append(response)
+					return len(data)
+				rval = self._send(data, temperatures=True)
+			elif self._coalescer is not None:
+				flushed, action = self._coalescer.feed(data)
+				if flushed is not None:
+					self._send(flushed, ack=False)
+				if action == PASS:
+					rval = self._send(data)
+				else:
+					# held back to be sent as part of a longer move, so it is
+					# as good as accepted as far as OctoPrint is concerned
+					if action == MERGED:
+						self.stats.coalesced += 1
+					self._append("ok")
+					rval = len(data)
+			else:
+				rval = self._send(data)
+			self._progress.poll()
+			return rval
+
+	# a gap between OctoPrint's lines: send the rest of a coalesced run and
+	# anything that was waiting for a gap, unless a write is under way
+	def _between_lines(self):
+		if not self._sending.acquire(False):
+			return
+		try:
+			self._flush_segments()
+			if self._profile_pending is not None:
+				self._apply_pending_profile()
+			self._progress.poll()
+		finally:
+			self._sending.release()
+
+	# send the pending run of coalesced moves once OctoPrint has gone quiet
+	def _flush_segments(self):
+		if self._coalescer is not None and self._coalescer.pending():
+			self._send(self._coalescer.take(), ack=False)
+
+	def _send(self, data, temperatures=False, ack=True):
 		try:
 			rval = len(data)
 			data = data.strip()
-			str_data = data
-			if not isinstance(str_data, str):
-				str_data = data.decode('utf-8')
 			if (self.baudrate != self._baudrate):
 				try:
 					self._baudrate = self.baudrate
 					self._logger.info("new baudrate = %d" % self.baudrate)
-					gpx.set_baudrate(self.baudrate)
+					with self._link:
+						self._gpx.set_baudrate(self.baudrate)
 					self.baudrateError = False
 				except ValueError:
 					self.baudrateError = True
-					self.outgoing.put('')
+					self.outgoing.put(b'')
 					return 0
 
 			# look for a line number
 			# line number means OctoPrint is streaming gcode at us (gpx.ini flavor)
 			# no line number means OctoPrint is generating the gcode (reprap flavor)
-			match = self._regex_linenumber.match(str_data)
-
-			# try to talk to the bot
-			try:
-				if match is None:
-					reprapSave = gpx.reprap_flavor(True)
+			numbered = has_line_number(data)
 
-				# loop sending until the queue isn't full
-				timeout_retries = 0
-				bo_retries = 0
-				while True:
+			# loop sending until the queue isn't full
+			timeout_retries = 0
+			bo_retries = 0
+			while True:
+				try:
+					with self._link:
+						# the flavor again each time, another thread may have
+						# used the link while we waited
+						if numbered:
+							self.flavor.stream()
+						else:
+							self.flavor.host()
+						start = time.time()
+						response = self._gpx.write(data)
+						waiting = self._reader is not None and self._waiting()
+					self._last_write = now = time.time()
+					if ack:
+						self._append(response)
+					if temperatures:
+						self._temperatures.store(response)
+					self.stats.wrote(now - start)
+					self.flow.accepted()
+					if waiting:
+						# start polling for the end of the wait right away
+						self._reader_wake.set()
+					break
+				except self._gpx.BufferOverflow:
+					bo_retries += 1
+					paused = False
 					try:
-						self._append(gpx.write(data))
+						with self._link:
+							paused = self._gpx.build_paused()
+						if paused and bo_retries == 1:
+							self._append("// echo: print paused at bot")
+					except IOError:
+						pass
+					delay = self.flow.overflow(paused)
+					self.stats.overflow(delay)
+					if self._cancelling.wait(delay) or self._closing.is_set():
+						# cancel is waiting to jump the queue, drop the line
+						if ack:
+							self._append("ok")
 						break
-					except gpx.BufferOverflow:
-						bo_retries += 1
-						try:
-							if gpx.build_paused():
-								if bo_retries == 1:
-									self._append("// echo: print paused at bot")
-								time.sleep(1) # 1 sec
-						except IOError:
-							pass
-						time.sleep(0.1) # 100 ms
-					except gpx.Timeout:
-						time.sleep(1)
-						timeout_retries += 1
-						if (timeout_retries >= 5):
-							raise
+				except self._gpx.Timeout:
+					self.stats.timeout(1)
+					if self._cancelling.wait(1) or self._closing.is_set():
+						if ack:
+							self._append("ok")
+						break
+					timeout_retries += 1
+					if (timeout_retries >= 5):
+						raise
 
-			finally:
-				if match is None:
-					gpx.reprap_flavor(reprapSave)
-		except gpx.CancelBuild:
+		except self._gpx.CancelBuild:
 			self._bot_reports_build_cancelled()
 		return rval
 
-	def readline_str(self):
+	def _temperature_loop(self):
+		interval = self._temperature_interval
+		while not self._temperature_stop.wait(interval):
+			if self._streamer is not None:
+				continue
+			# refresh while the link is quiet, or once the cached response is
+			# half way to max_age wait for a gap between lines rather than
+			# leaving OctoPrint's polls to find it expired
+			age = self._temperatures.age()
+			due = age is None or age >= self._temperatures.max_age / 2
+			if not due and time.time() - self._last_write < interval / 2:
+				continue
+			if not self._link.acquire(due):
+				continue
+			try:
+				if self._streamer is None:
+					self.flavor.host()
+					self._temperatures.store(self._gpx.write("M105"))
+			except (self._gpx.BufferOverflow, self._gpx.Timeout, self._gpx.CancelBuild):
+				pass
+			except Exception as e:
+				self._logger.warn("GPX temperature poller caught exception: %s" % e)
+			finally:
+				self._link.release()
+
+	def _reader_loop(self):
+		while not self._reader_stop.is_set():
+			try:
+				listing = waiting = False
+				with self._link:
+					if self._streamer is None:
+						self._append(self._gpx.readnext())
+						listing = self._gpx.listing_files()
+						waiting = self._waiting()
+				if listing:
+					continue
+				if self._streamer is None:
+					self._between_lines()
+			except self._gpx.CancelBuild:
+				self._bot_reports_build_cancelled()
+				self._append('// echo: build cancelled')
+				waiting = False
+			except Exception as e:
+				if self._reader_stop.is_set():
+					break
+				self._logger.warn("GPX reader thread caught exception: %s" % e)
+				waiting = False
+			interval = self._reader_interval if waiting else max(self.timeout, self._reader_interval)
+			self._reader_wake.wait(interval)
+			self._reader_wake.clear()
+
+	def readline(self):
+		if self._reopen_window:
+			self._reopen_window = False
+			self._credit_ack_window()
+		line = self._readline()
+		if self._clear_to_send is not None and (line.startswith(b"Resend") or line.startswith(b"rs ")):
+			# OctoPrint empties its clear to send counter as it handles the
+			# resend, put the window back before it reads the next line
+			self._reopen_window = True
+		return line
+
+	def _readline(self):
+		self.stats.queue_depth.record(self.outgoing.qsize())
 		try:
 			if (self.baudrateError):
 				if (self._baudrate != self.baudrate):
-					gpx.write("M105")
-				return ''
+					with self._link:
+						self._gpx.write("M105")
+				return b''
 
-			try:
-				return self.outgoing.get_nowait()
-			except queue.Empty:
-				pass
+			line = self.outgoing.get_nowait()
+			if line is not None:
+				return line
+
+			if self._reader is not None:
+				# the reader thread does the polling, we just wait for it
+				line = self.outgoing.get(timeout=max(self.timeout, self._reader_interval))
+				return line if line is not None else b''
 
-			if gpx.listing_files():
-				return gpx.readnext()
+			with self._link:
+				if self._streamer is None and self._gpx.listing_files():
+					self._append(self._gpx.readnext())
+					line = self.outgoing.get_nowait()
+					return line if line is not None else b''
 
 			while True:
-				timeout = 2 if gpx.waiting else self.timeout
-				try:
-					return self.outgoing.get(timeout=timeout)
-				except queue.Empty:
-					self._append(gpx.readnext())
+				with self._link:
+					waiting = self._streamer is None and self._waiting()
+				timeout = 2 if waiting else self.timeout
+				line = self.outgoing.get(timeout=timeout)
+				if line is not None:
+					return line
+				if self._streamer is None:
+					with self._link:
+						self._append(self._gpx.readnext())
+					self._between_lines()
 
-		except gpx.CancelBuild:
+		except self._gpx.CancelBuild:
 			self._bot_reports_build_cancelled()
-			return '// echo: build cancelled'
+			return b'// echo: build cancelled'
 
-	def readline(self):
-		return self.readline_str().encode('ascii', errors='ignore')
+	# Every line is still acked once, as the bot accepts it, so OctoPrint's
+	# line numbers stay in step. A window just lets OctoPrint send more lines
+	# before the first of them is acked, which keeps the writer thread (and
+	# so the bot's buffer) fed on prints with lots of short segments.
+	# OctoPrint has no API for handing out credits so we set its clear to
+	# send counter for the extra lines, if this version of OctoPrint has one
+	# we recognize.
+	def open_ack_window(self, comm):
+		self._clear_to_send = None
+		window = self.ack_window
+		if window <= 1 or comm is None:
+			return
+		clear_to_send = getattr(comm, "_clear_to_send", None)
+		if clear_to_send is None or not callable(getattr(clear_to_send, "set", None)):
+			self._logger.warn("Unrecognized OctoPrint comm, acking every line")
+			return
+		# OctoPrint sizes the counter from serial.ackMax, widen it for this
+		# connection only, the global setting is shared with other printers
+		for attr in ("_max", "_maximum"):
+			if isinstance(getattr(clear_to_send, attr, None), int):
+				if getattr(clear_to_send, attr) < window:
+					setattr(clear_to_send, attr, window)
+				break
+		else:
+			self._logger.warn("Unrecognized OctoPrint clear to send counter, acking every line")
+			return
+		if isinstance(getattr(comm, "_ack_max", None), int) and comm._ack_max < window:
+			comm._ack_max = window
+		self._clear_to_send = clear_to_send
+		self._credit_ack_window()
+		self._logger.info("Allowing %d lines in flight" % window)
+
+	def _credit_ack_window(self):
+		clear_to_send = self._clear_to_send
+		if clear_to_send is None:
+			return
+		for i in range(self.ack_window - 1):
+			clear_to_send.set()
+
+	def readline_str(self):
+		return self.readline().decode('ascii')
+
+	# print an x3g file by sending its packets straight to the bot. gpx lets
+	# go of the serial port for the duration and reconnects afterwards.
+	def stream_x3g(self, path):
+		import serial
+		from .x3gstream import X3gStreamer
+		with self._sending:
+			if self._streamer is not None:
+				raise ValueError("Already streaming x3g")
+			self._flush_segments()
+			with self._link:
+				self._gpx.disconnect()
+				try:
+					port = serial.Serial(self.port, self._baudrate, timeout=1)
+				except Exception:
+					self._connect()
+					raise
+				self._streamer = X3gStreamer(port, self._logger, self.flow, self._stream_progress)
+		thread = threading.Thread(target=self._stream_x3g, args=(path,), name="GPX x3g streamer")
+		thread.daemon = True
+		thread.start()
+
+	def _stream_progress(self, percent):
+		if percent % 10 == 0:
+			self._append("// echo: x3g stream %d%%" % percent)
+
+	def _stream_x3g(self, path):
+		from .x3gstream import X3gCancelled
+		streamer = self._streamer
+		try:
+			start = time.time()
+			self._append("// echo: x3g stream started %s" % os.path.basename(path))
+			packets = streamer.stream(path)
+			self._logger.info("Streamed %d x3g packets from %s in %.1f secs" % (packets, path, time.time() - start))
+			self._append("// echo: x3g stream done")
+		except X3gCancelled:
+			self._logger.info("x3g stream cancelled")
+			try:
+				streamer.abort()
+			except Exception as e:
+				self._logger.warn("Unable to abort x3g stream: %s" % e)
+			self._append("// echo: x3g stream cancelled")
+		except Exception as e:
+			self._logger.warn("x3g stream failed: %s" % e)
+			self._append("// echo: x3g stream failed: %s" % e)
+		finally:
+			streamer.close()
+			with self._link:
+				self._streamer = None
+				try:
+					self._connect()
+				except Exception as e:
+					self._logger.error("Unable to reconnect after the x3g stream: %s" % e)
+					self._append("Error: unable to reconnect after the x3g stream: %s" % e)
+
+	# a note in the terminal for things that happen outside the command stream
+	def echo(self, message):
+		self._append("// echo: %s" % message)
+
+	def reset_stats(self):
+		self.flow.reset()
+		self.stats.reset()
+		self._progress.reset()
+
+	def get_stats(self):
+		stats = self.stats.to_dict()
+		stats["flow"] = self.flow.stats()
+		if self._coalescer is not None:
+			stats["coalesce_tolerance"] = self._coalescer.tolerance
+		if self._temperatures is not None:
+			stats["temperature_cache"] = dict(hits=self._temperatures.hits,
+				misses=self._temperatures.misses, age=self._temperatures.age())
+		return stats
+
+	@property
+	def gpx(self):
+		return self._gpx
+
+	# the eeprom routes run on OctoPrint's web threads
+	def read_eeprom(self, eepromid):
+		with self._link:
+			return self._gpx.read_eeprom(eepromid)
+
+	def write_eeprom(self, eepromid, value):
+		with self._link:
+			return self._gpx.write_eeprom(eepromid, value)
+
+	def is_streaming(self):
+		return self._streamer is not None
 
 	def cancel(self):
 		self._logger.warn("Cancelling build %s", "by the printer" if self._bot_cancelled else "by OctoPrint")
+		if self._streamer is not None:
+			self._streamer.stop()
+		elif not self._bot_cancelled:
+			self._abort()
 		self._bot_cancelled = False;
 
+	# throw away everything that hasn't reached the bot yet and tell the bot
+	# to stop right now rather than finishing what's in its buffer, which
+	# could include ten minutes of heating the platform
+	def _abort(self):
+		start = time.time()
+		self._cancelling.set()
+		try:
+			# OctoPrint has already been told these were written, so it is
+			# still counting on an ok for each
+			dropped = 0
+			if self._writer is not None:
+				while True:
+					try:
+						data = self._send_queue.get_nowait()
+					except queue.Empty:
+						break
+					if data is None:
+						# close is waiting on the writer, put it back
+						self._send_queue.put(None)
+						break
+					dropped += 1
+			oks = sum(1 for line in self.outgoing.drain() if line.startswith(b"ok"))
+			for i in range(oks + dropped):
+				self.outgoing.put(b"ok")
+
+			with self._sending, self._link:
+				self._cancelling.clear()
+				if self._coalescer is not None:
+					self._coalescer.reset()
+				# M112 is translated to the s3g abort immediately query which
+				# the bot handles even when its command buffer is full
+				self.flavor.host()
+				self._gpx.write("M112")
+		except (self._gpx.BufferOverflow, self._gpx.Timeout, self._gpx.CancelBuild) as e:
+			self._logger.warn("Abort on cancel failed: %s" % e.__class__.__name__)
+		finally:
+			self._cancelling.clear()
+		latency = time.time() - start
+		self.stats.cancel_latency = latency
+		self._logger.info("Aborted build %.3f secs after cancel" % latency)
+
 	def close(self):
-		gpx.disconnect()
+		# wake a line that is backing off on a full buffer, the bot may be
+		# paused at its LCD and not take it for hours
+		self._closing.set()
+		self._cancelling.set()
+		if self._temperature_poller is not None:
+			self._temperature_stop.set()
+			self._temperature_poller.join(5)
+			self._temperature_poller = None
+		if self._reader is not None:
+			self._reader_stop.set()
+			self._reader_wake.set()
+			self._reader.join(5)
+			self._reader = None
+		if self._writer is not None:
+			try:
+				self._send_queue.put_nowait(None)
+			except queue.Full:
+				# the writer is busy, it sees _closing when it's done
+				pass
+			self._writer.join(5)
+			self._writer = None
+		# a thread that didn't stop in time may still be in the middle of
+		# a gpx call
+		with self._link:
+			self._gpx.disconnect()
+			if self._gpx is not gpx:
+				self._gpx.close()
 		return
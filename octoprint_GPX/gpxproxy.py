@@ -0,0 +1,84 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Stands in for the gcodex3g module, forwarding every call over a pipe to a
+# worker process that has the real extension loaded.  gcodex3g keeps its
+# state in C globals, so this is also what lets each GpxPrinter have its own.
+
+import functools
+import multiprocessing
+import threading
+
+import gpxworker
+
+class BufferOverflow(Exception):
+	pass
+
+class Timeout(Exception):
+	pass
+
+class CancelBuild(Exception):
+	pass
+
+class UnknownFirmware(Exception):
+	pass
+
+_exceptions = dict(
+	BufferOverflow=BufferOverflow,
+	Timeout=Timeout,
+	CancelBuild=CancelBuild,
+	UnknownFirmware=UnknownFirmware,
+	ValueError=ValueError,
+	IOError=IOError,
+	OSError=IOError)
+
+class GpxProxy(object):
+	BufferOverflow = BufferOverflow
+	Timeout = Timeout
+	CancelBuild = CancelBuild
+	UnknownFirmware = UnknownFirmware
+
+	def __init__(self, logger):
+		self._logger = logger
+		if hasattr(multiprocessing, "get_context"):
+			# don't fork OctoPrint with all of its threads
+			context = multiprocessing.get_context("spawn")
+		else:
+			context = multiprocessing
+		self._conn, child = context.Pipe()
+		self._process = context.Process(target=gpxworker.serve, args=(child,), name="GPX translator")
+		self._process.daemon = True
+		self._process.start()
+		child.close()
+		self._lock = threading.Lock()
+		self._logger.info("Started GPX translator process %d" % self._process.pid)
+
+	def _call(self, name, *args):
+		with self._lock:
+			try:
+				self._conn.send((name, args))
+				ok, value = self._conn.recv()
+			except (EOFError, IOError, OSError):
+				raise IOError("GPX translator process exited with %s" % self._process.exitcode)
+		if ok:
+			return value
+		classname, message = value
+		raise _exceptions.get(classname, IOError)(message)
+
+	def __getattr__(self, name):
+		if name.startswith("_"):
+			raise AttributeError(name)
+		return functools.partial(self._call, name)
+
+	def close(self):
+		with self._lock:
+			try:
+				self._conn.send(None)
+			except (IOError, OSError):
+				pass
+			self._conn.close()
+		self._process.join(5)
+		if self._process.is_alive():
+			self._process.terminate()
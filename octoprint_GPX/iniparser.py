@@ -4,8 +4,55 @@ __author__ = "Mark Walker <markwal@hotmail.com> based on work by Gina Häußge"
 __license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
 
 from collections import OrderedDict
+import hashlib
 import re
 import os
+import tempfile
+import threading
+
+# Parses keyed on filename, reused for as long as the file's mtime, size and
+# content hash are unchanged.  The settings dialog, serial_factory and the
+# machine definition routes all read the same handful of files over and over.
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _copy(parsed):
+	ini, idx, lines, counter = parsed
+	return (dict((name, dict(section)) for name, section in ini.items()),
+		OrderedDict((name, section.copy()) for name, section in idx.items()),
+		list(lines), counter)
+
+# One section of the file.  entries are in file order, keyed on option name
+# or, for comments and anything else that isn't an option, a counter.  An
+# option is kept as [name, space, value, space, comment] so an update just
+# replaces the value.  The blank lines that end the section are only counted
+# so that new options can be appended ahead of them.
+class _Section():
+	def __init__(self):
+		self.entries = OrderedDict()
+		self.blanks = 0
+
+	def copy(self):
+		section = _Section()
+		for key, entry in self.entries.items():
+			section.entries[key] = list(entry) if isinstance(entry, list) else entry
+		section.blanks = self.blanks
+		return section
+
+	def lines(self):
+		for entry in self.entries.values():
+			yield "%s=%s%s%s%s" % tuple(entry) if isinstance(entry, list) else entry
+		for i in range(self.blanks):
+			yield ""
+
+if hasattr(os, "replace"):
+	_replace = os.replace
+else:
+	def _replace(src, dst):
+		# python 2 on windows won't rename over an existing file
+		if os.name == "nt" and os.path.exists(dst):
+			os.remove(dst)
+		os.rename(src, dst)
 
 class IniParser():
 	def __init__(self, filename, logger):
@@ -14,38 +61,62 @@ class IniParser():
 		self.ini = {}
 		self.idx = OrderedDict()
 		self.filename = filename
+		# hash of the file contents last read, changes whenever they do
+		self.version = None
 		self._logger = logger
 		self._regex_section = re.compile("\[(.+)\]")
 		self._regex_name_value = re.compile("([^=;]+?)=(\s*)(.+?)(\s*)(;.+)?$")
 
 	def read(self):
+		with open(self.filename, "rb") as inifile:
+			st = os.fstat(inifile.fileno())
+			data = inifile.read()
+		version = hashlib.sha1(data).hexdigest()
+		key = (st.st_mtime, st.st_size, version)
+		with _cache_lock:
+			cached = _cache.get(self.filename)
+		if cached is not None and cached[0] == key:
+			self.ini, self.idx, self.lines, self.counter = _copy(cached[1])
+			self.version = version
+			self._logger.debug("%s unchanged, using cached parse" % self.filename)
+			return self.ini
+
 		self.ini = ini = {}
 		self.idx = idx = OrderedDict()
 		self.lines = lines = []
 		self.counter = 0
 		sectionname = "None"
 		ini[sectionname] = {}
-		idx[sectionname] = OrderedDict()
-		with open(self.filename) as inifile:
-			for line in inifile:
-				line = line.strip()
-				self._logger.info(line)
-				lines.append(line);
-				m = self._regex_section.match(line)
-				if m is not None:
-					sectionname = m.group(1)
-					ini[sectionname] = {}
-					idx[sectionname] = OrderedDict()
-				else:
-					m = self._regex_name_value.match(line)
-					if m is not None:
-						itemname = m.group(1).strip()
-						if not itemname == 'None':
-							ini[sectionname][itemname] = m.group(3)
-							idx[sectionname][itemname] = line
-					else:
-						self.counter += 1
-						idx[sectionname][self.counter] = line
+		idx[sectionname] = section = _Section()
+		if not isinstance(data, str):
+			data = data.decode("utf-8")
+		for line in data.splitlines():
+			line = line.strip()
+			self._logger.debug(line)
+			lines.append(line);
+			if line == '':
+				section.blanks += 1
+				continue
+			m = self._regex_section.match(line)
+			if m is not None:
+				sectionname = m.group(1)
+				ini[sectionname] = {}
+				idx[sectionname] = section = _Section()
+				continue
+			# blanks that turned out not to be trailing
+			for i in range(section.blanks):
+				self.counter += 1
+				section.entries[self.counter] = ""
+			section.blanks = 0
+			m = self._regex_name_value.match(line)
+			if m is not None:
+				itemname = m.group(1).strip()
+				if not itemname == 'None':
+					ini[sectionname][itemname] = m.group(3)
+					section.entries[itemname] = list(m.groups(""))
+			else:
+				self.counter += 1
+				section.entries[self.counter] = line
 
 #		config = ConfigParser.SafeConfigParser()
 #		config.read(foo)
@@ -54,7 +125,10 @@ class IniParser():
 #			ini[section] = {}
 #			for (name, value) in config.items(section):
 #				ini[section][name] = value
-		self._logger.info(repr(ini))
+		self._logger.debug(repr(ini))
+		self.version = version
+		with _cache_lock:
+			_cache[self.filename] = (key, _copy((ini, idx, lines, self.counter)))
 		return ini
 
 	def update(self, ini):
@@ -64,7 +138,7 @@ class IniParser():
 			if section.items is None:
 				raise ValueError("Invalid section")
 			for option, value in section.items():
-				self._logger.info("option, value: %s, %s" % (option, repr(value)))
+				self._logger.debug("option, value: %s, %s" % (option, repr(value)))
 				if ("%s" % value) in ["True", "False"]:
 					value = 1 if value else 0
 				if option == "machine_type" and (value == "" or value == "undefined" or value == "None"):
@@ -73,62 +147,75 @@ class IniParser():
 					self.ini[sectionname] = {}
 				self.ini[sectionname][option] = value
 				if sectionname not in self.idx:
-					self.idx[sectionname] = OrderedDict()
-				line = self.idx[sectionname].get(option)
+					self.idx[sectionname] = _Section()
+				entries = self.idx[sectionname].entries
+				entry = entries.get(option)
 				if value == '' or value == 'undefined' or value == 'None' or value is None:
 					self._logger.info("deleteing [{0}][{1}]".format(sectionname, option))
 					# means delete
-					if line is not None:
-						del self.idx[sectionname][option]
+					if entry is not None:
+						del entries[option]
 					continue
-				if line is not None:
-					m = self._regex_name_value.match(line)
-					if m is not None:
-						g = m.groups("")
-						g = g[0:2] + (value,) + g[3:]
-						self.idx[sectionname][option] = "%s=%s%s%s%s" % g
-						continue
-				section = self.idx[sectionname]
-				blanks = 0
-				if len(section) > 0:
-					while section[next(reversed(section))].strip() == '':
-						section.popitem()
-						blanks += 1
-				self.counter += 1
-				section[self.counter] = "%s=%s" % (option, value)
-				for i in range(0, blanks):
-					self.counter += 1
-					section[self.counter] = ""
+				if entry is not None:
+					entry[2] = "%s" % value
+				else:
+					entries[option] = [option, "", "%s" % value, "", ""]
 
-	def _write_section(self, inifile, section):
-		count = 0
-		for option, line in section.items():
-			inifile.write(line)
-			count += 1
-			inifile.write("\n")
-		return count
+	def _write_section(self, out, section):
+		count = len(out)
+		out.extend(section.lines())
+		return len(out) - count
 
+	# the file as it would be written and the number of lines in it
+	def serialize(self):
+		out = []
+		count = 0
+		# whatever comes before the first section header
+		if 'None' in self.idx:
+			count += self._write_section(out, self.idx['None'])
+		for sectionname, section in self.idx.items():
+			if sectionname is not None and sectionname != 'None':
+				out.append("[%s]" % sectionname)
+				count += self._write_section(out, section)
+		out.append("")
+		return "\n".join(out), count
 
+	# write to a temp file next to the real one and rename it over the top so
+	# a crash part way through leaves the old file rather than half of one
 	def write(self):
-		self._logger.info("Open %s" % self.filename)
-		with open(self.filename, 'w') as inifile:
-			self._logger.info("Write %s" % self.filename)
-			count = 0
-			if None in self.idx:
-				count += self._write_section(inifile, self.idx[None])
-			for sectionname, section in self.idx.items():
-				if sectionname is not None and sectionname != 'None':
-					inifile.write("[%s]\n" % sectionname)
-					count += self._write_section(inifile, section)
+		text, count = self.serialize()
 		if count == 0:
-			self._logger.info("For %s, all sections empty, removing file.", self.filename)
-			os.remove(self.filename)
+			if os.path.exists(self.filename):
+				self._logger.info("For %s, all sections empty, removing file.", self.filename)
+				os.remove(self.filename)
+			self.version = None
+			return
+		data = text.encode("utf-8")
+		version = hashlib.sha1(data).hexdigest()
+		if version == self.version and os.path.isfile(self.filename):
+			self._logger.debug("%s unchanged, not writing" % self.filename)
+			return
+		self._logger.info("Write %s" % self.filename)
+		fd, tmp_path = tempfile.mkstemp(prefix=".gpx", suffix=".ini", dir=os.path.dirname(os.path.abspath(self.filename)))
+		try:
+			with os.fdopen(fd, "wb") as inifile:
+				inifile.write(data)
+				inifile.flush()
+				os.fsync(inifile.fileno())
+			# mkstemp makes it private, keep the mode the old file had
+			mode = os.stat(self.filename).st_mode if os.path.exists(self.filename) else 0o644
+			os.chmod(tmp_path, mode & 0o777)
+			_replace(tmp_path, self.filename)
+		finally:
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+		self.version = version
 
 	def dump(self):
 		for sectionname, section in self.idx.items():
 			if sectionname is not None and sectionname != 'None':
 				print("[{0}]".format(sectionname))
-			for option, line in section.items():
+			for line in section.lines():
 				print(line)
 
 	def get(self, sectionname, itemname):
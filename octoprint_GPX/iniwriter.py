@@ -0,0 +1,59 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import threading
+
+# Write behind for IniParser.  The settings dialog tends to post the same
+# profile several times in quick succession; schedule holds on to the updated
+# parser and writes it once things have been quiet for delay seconds.
+# Anything that is about to read the file from disk (gpx included) should
+# flush first, and anything about to update it should start from pending so
+# it builds on the changes that haven't been written yet and go through
+# update so the timer never writes out a half updated profile.
+class IniWriter():
+	def __init__(self, logger, delay=0.5):
+		self._logger = logger
+		self.delay = delay
+		self._lock = threading.Lock()
+		self._pending = {}
+		self._timer = None
+
+	# apply ini to parser and schedule the write
+	def update(self, parser, ini):
+		with self._lock:
+			parser.update(ini)
+			self._schedule(parser)
+
+	def schedule(self, parser):
+		with self._lock:
+			self._schedule(parser)
+
+	def _schedule(self, parser):
+		self._pending[parser.filename] = parser
+		if self._timer is not None:
+			self._timer.cancel()
+		self._timer = threading.Timer(self.delay, self.flush)
+		self._timer.daemon = True
+		self._timer.start()
+
+	# the parser waiting to be written for filename, or None
+	def pending(self, filename):
+		with self._lock:
+			return self._pending.get(filename)
+
+	def flush(self):
+		with self._lock:
+			pending = self._pending
+			self._pending = {}
+			if self._timer is not None:
+				self._timer.cancel()
+				self._timer = None
+			for parser in pending.values():
+				try:
+					parser.write()
+				except (IOError, OSError) as e:
+					self._logger.warn("Unable to write %s: %s" % (parser.filename, e))
+				except Exception:
+					self._logger.exception("Unable to write %s" % parser.filename)
@@ -0,0 +1,44 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Line classification shared by the queuing hook and GpxPrinter.write.  Every
+# line OctoPrint sends passes through both, so these stick to str/bytes
+# methods that run in C and avoid decoding or running a regular expression
+# unless the cheap test says the line might be interesting.  A general pure
+# python tokenizer is several times slower than either.
+
+import re
+
+_regex_m73 = re.compile("N(\d+) M73 P(\d+)")
+_line_number_prefix = ("N", b"N")
+_moves = ("G0", "G1", b"G0", b"G1")
+
+# line number means OctoPrint is streaming gcode at us (gpx.ini flavor)
+# no line number means OctoPrint is generating the gcode (reprap flavor)
+# works on str or bytes, expects the line already stripped
+def has_line_number(line):
+	return line[1:2].isdigit() and line[:1] in _line_number_prefix
+
+# the P of an "N<n> M73 P<p>" line or None
+def m73_percent(cmd):
+	if "M73" not in cmd:
+		return None
+	match = _regex_m73.match(cmd)
+	if match is None:
+		return None
+	return int(match.group(2))
+
+# a G0/G1 with a Z word, usually the move to the next layer.  Nearly every
+# line is rejected by the substring test before it gets split.
+def is_z_move(line):
+	if isinstance(line, bytes):
+		if b"Z" not in line:
+			return False
+	elif "Z" not in line:
+		return False
+	words = line.split()
+	if words and has_line_number(words[0]):
+		words = words[1:]
+	return bool(words) and words[0] in _moves
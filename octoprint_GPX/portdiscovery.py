@@ -0,0 +1,40 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import glob
+import os
+
+# Finds the bot's serial port for AUTO via the udev symlinks in
+# /dev/serial/by-id.  The answer is kept until the folder changes (udev adds
+# or removes a link when a device is plugged in or unplugged, which bumps the
+# folder's mtime) so reconnecting doesn't glob and readlink every time.
+class PortDiscovery():
+	def __init__(self, logger, folder="/dev/serial/by-id", pattern="*MakerBot_Industries_The_Replicator*"):
+		self._logger = logger
+		self.folder = folder
+		self.pattern = pattern
+		self._mtime = None
+		self._port = None
+
+	def discover(self):
+		try:
+			mtime = os.stat(self.folder).st_mtime
+		except OSError:
+			self._mtime = self._port = None
+			return None
+		if mtime == self._mtime:
+			return self._port
+		port = None
+		try:
+			ports = glob.glob(os.path.join(self.folder, self.pattern))
+			if ports:
+				port = os.path.normpath(os.path.join(self.folder, os.readlink(ports[0])))
+				self._logger.info("Discovered %s at %s" % (os.path.basename(ports[0]), port))
+		except OSError:
+			# oh well, it was worth a try
+			self._logger.debug("Failed to discover port via %s" % self.folder)
+		self._mtime = mtime
+		self._port = port
+		return port
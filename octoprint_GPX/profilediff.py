@@ -0,0 +1,68 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Key level differences between the gpx.ini gpx has applied and the one on
+# disk so a settings save only touches gpx when the profile changed and
+# then, when it can, only with the keys that did.
+
+# Changing any of these in the middle of a print changes how the rest of the
+# gcode maps onto the bot's axes, so they wait for the print to end.  The
+# rest only affect commands gpx hasn't translated yet and are safe to apply
+# at the next layer.
+_unsafe_sections = frozenset(["x", "y", "z", "a", "b", "machine"])
+_unsafe_options = frozenset([("printer", "machine_type"), ("printer", "gcode_flavor")])
+
+# the profile as {section: {option: value}} without the lines ahead of the
+# first section header
+def profile(ini):
+	return dict((name, dict(section)) for name, section in ini.items() if name != "None")
+
+class ProfileDiff():
+	def __init__(self, old, new):
+		self.changed = {}
+		self.removed = []
+		for sectionname, section in new.items():
+			previous = old.get(sectionname, {})
+			for option, value in section.items():
+				if previous.get(option) != value:
+					self.changed.setdefault(sectionname, {})[option] = value
+		for sectionname, section in old.items():
+			for option in section:
+				if option not in new.get(sectionname, {}):
+					self.removed.append((sectionname, option))
+
+	def __bool__(self):
+		return bool(self.changed or self.removed)
+	__nonzero__ = __bool__
+
+	def keys(self):
+		keys = [(sectionname, option) for sectionname, section in self.changed.items() for option in section]
+		return keys + self.removed
+
+	def changes(self, sectionname, option):
+		return option in self.changed.get(sectionname, {}) or (sectionname, option) in self.removed
+
+	# gpx can't unset a key or switch machines on top of the current
+	# settings, those need a reset and a read of the whole file
+	def needs_reset(self):
+		return bool(self.removed) or "machine_type" in self.changed.get("printer", {})
+
+	def safe_mid_print(self):
+		if self.needs_reset():
+			return False
+		for sectionname, option in self.keys():
+			if sectionname in _unsafe_sections or (sectionname, option) in _unsafe_options:
+				return False
+		return True
+
+	# an ini with just the changed keys for gpx.read_ini to lay on top
+	def ini_text(self):
+		lines = []
+		for sectionname, section in sorted(self.changed.items()):
+			lines.append("[%s]" % sectionname)
+			for option, value in sorted(section.items()):
+				lines.append("%s=%s" % (option, value))
+		lines.append("")
+		return "\n".join(lines)
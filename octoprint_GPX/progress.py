@@ -0,0 +1,54 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import threading
+import time
+
+# Holds on to the latest build percentage from OctoPrint and hands it to send
+# only when GpxPrinter says it has a gap between lines (poll), at most once
+# per min_interval seconds and only when the whole percent has changed.  send
+# returns False if the bot couldn't take it, in which case we'll try again at
+# the next gap unless a newer percentage has arrived by then.
+class ProgressUpdater():
+	def __init__(self, send, min_interval=5.0, clock=time.time):
+		self._send = send
+		self.min_interval = min_interval
+		self._clock = clock
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self._pending = None
+			self._sent = None
+			self._sent_at = None
+
+	def update(self, percent):
+		with self._lock:
+			self._pending = int(percent)
+
+	def poll(self):
+		# unlocked peek, this is called between every pair of lines
+		if self._pending is None:
+			return
+		now = self._clock()
+		with self._lock:
+			percent = self._pending
+			if percent is None:
+				return
+			if percent == self._sent:
+				self._pending = None
+				return
+			if self._sent_at is not None and now - self._sent_at < self.min_interval:
+				return
+			self._pending = None
+		if self._send(percent):
+			with self._lock:
+				self._sent = percent
+				self._sent_at = now
+		else:
+			with self._lock:
+				if self._pending is None:
+					self._pending = percent
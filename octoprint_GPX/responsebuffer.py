@@ -0,0 +1,63 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+from collections import deque
+import threading
+
+# Responses waiting for OctoPrint to read them.  Lines are encoded to the
+# bytes readline returns once when they are produced, so reading one is a
+# popleft under a single condition variable instead of a queue.Queue round
+# trip plus an encode.
+class ResponseBuffer():
+	def __init__(self):
+		self._lines = deque()
+		self._cond = threading.Condition(threading.Lock())
+
+	# add a response from gpx, which may be several lines
+	def append(self, s):
+		if not s:
+			return
+		if not isinstance(s, bytes):
+			s = s.encode('ascii', 'ignore')
+		with self._cond:
+			if b'\n' in s:
+				self._lines.extend(s.split(b'\n'))
+			else:
+				self._lines.append(s)
+			self._cond.notify()
+
+	# add a single line as is, even if it is empty
+	def put(self, line):
+		if not isinstance(line, bytes):
+			line = line.encode('ascii', 'ignore')
+		with self._cond:
+			self._lines.append(line)
+			self._cond.notify()
+
+	# remove and return everything waiting
+	def drain(self):
+		with self._cond:
+			lines = list(self._lines)
+			self._lines.clear()
+			return lines
+
+	# next line or None if nothing arrives within timeout seconds
+	def get(self, timeout=None):
+		with self._cond:
+			if not self._lines:
+				self._cond.wait(timeout)
+				if not self._lines:
+					return None
+			return self._lines.popleft()
+
+	def get_nowait(self):
+		# popleft is atomic, no need for the lock
+		try:
+			return self._lines.popleft()
+		except IndexError:
+			return None
+
+	def qsize(self):
+		return len(self._lines)
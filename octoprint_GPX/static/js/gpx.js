@@ -21,6 +21,33 @@ $(function() {
         this.packing_density = undefined;
     };
 
+    // Loads JSON routes into a knockout mapped view model. The routes send
+    // ETags, so with ifModified jQuery revalidates instead of refetching and
+    // a 304 only maps the last response again if the view model has been
+    // edited since or was last loaded from somewhere else.
+    function RevalidatingMapper(target) {
+        var self = this;
+        var responses = {};
+        var mappedUrl = undefined;
+        var mappedJson = undefined;
+
+        self.request = function(url) {
+            return OctoPrint.get(url, {dataType: "json", ifModified: true})
+                .then(function(data, status) {
+                    if (status === "notmodified") {
+                        if (mappedUrl === url && ko.mapping.toJSON(target) === mappedJson)
+                            return;
+                        data = responses[url];
+                    } else {
+                        responses[url] = data;
+                    }
+                    ko.mapping.fromJS(data, target);
+                    mappedUrl = url;
+                    mappedJson = ko.mapping.toJSON(target);
+                });
+        };
+    };
+
     function GpxSettingsViewModel(parameters) {
         var self = this;
 
@@ -56,6 +83,7 @@ $(function() {
         };
 
         self.ini = ko.mapping.fromJS(iniInitial);
+        self.iniMapper = new RevalidatingMapper(self.ini);
 
         self.showMachineDialog = function() {
             $("#gpx_machine_settings").modal("show");
@@ -68,14 +96,10 @@ $(function() {
         };
 
         self.requestData = function() {
-            OctoPrint.get("plugin/GPX/ini", {
-                dataType: "json",
-                contentType: "application/json; charset=UTF-8",
-            })
-            .done(function(data) {
-                ko.mapping.fromJS(data, self.ini);
-                self.haveData = true;
-            });
+            self.iniMapper.request("plugin/GPX/ini")
+                .done(function() {
+                    self.haveData = true;
+                });
         };
 
         self.onBeforeBinding = function () {
@@ -123,6 +147,7 @@ $(function() {
         };
 
         self.machine = ko.mapping.fromJS(machineInitial);
+        self.machineMapper = new RevalidatingMapper(self.machine);
 
         $("#gpx_machine_settings").on("show", function(event) {
             if (event.target.id == "gpx_machine_settings")
@@ -130,17 +155,11 @@ $(function() {
         });
 
         self.requestMachine = function() {
-            OctoPrint.get("plugin/GPX/machine/" + self.gpx.ini.printer.machine_type(), {dataType: "json"})
-                .done(function(data) {
-                    ko.mapping.fromJS(data, self.machine);
-                });
+            self.machineMapper.request("plugin/GPX/machine/" + self.gpx.ini.printer.machine_type());
         };
 
         self.requestMachineDefaults = function() {
-            OctoPrint.get("plugin/GPX/defaultmachine/" + self.gpx.ini.printer.machine_type(), {dataType: "json"})
-                .done(function(data) {
-                    ko.mapping.fromJS(data, self.machine);
-                });
+            self.machineMapper.request("plugin/GPX/defaultmachine/" + self.gpx.ini.printer.machine_type());
         };
 
         self.saveMachineSettings = function() {
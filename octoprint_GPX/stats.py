@@ -0,0 +1,116 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import math
+import threading
+import time
+
+# Power of two bucketed histogram.  Recording is a frexp and a list increment
+# so it is cheap enough to do on every line sent to the bot.
+class Histogram():
+	# bucket i counts values in [2**(i + min_exp - 1), 2**(i + min_exp)),
+	# everything below 2**min_exp lands in bucket 0
+	def __init__(self, min_exp=-20, buckets=32):
+		self.min_exp = min_exp
+		self.reset(buckets)
+
+	def reset(self, buckets=None):
+		self.counts = [0] * (buckets or len(self.counts))
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def record(self, value):
+		self.count += 1
+		self.total += value
+		if value > self.max:
+			self.max = value
+		if value <= 0:
+			i = 0
+		else:
+			i = math.frexp(value)[1] - self.min_exp
+			if i < 0:
+				i = 0
+			elif i >= len(self.counts):
+				i = len(self.counts) - 1
+		self.counts[i] += 1
+
+	def percentile(self, p):
+		if self.count == 0:
+			return 0.0
+		target = self.count * p / 100.0
+		seen = 0
+		for i, n in enumerate(self.counts):
+			seen += n
+			if seen >= target:
+				# report the upper edge of the bucket
+				return min(math.ldexp(1.0, i + self.min_exp), self.max)
+		return self.max
+
+	def to_dict(self):
+		return dict(
+			count=self.count,
+			mean=self.total / self.count if self.count else 0.0,
+			max=self.max,
+			p50=self.percentile(50),
+			p90=self.percentile(90),
+			p99=self.percentile(99))
+
+# Counters for everything that can make a print stutter between OctoPrint and
+# the bot.  Reset at the start of each print.
+class PrintStats():
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.write_time = Histogram()
+		self.queue_depth = Histogram(min_exp=0, buckets=16)
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self.started = time.time()
+			self.lines = 0
+			self.buffer_overflows = 0
+			self.timeouts = 0
+			self.slept = 0.0
+			self.progress_updates = 0
+			self.coalesced = 0
+			self.cancel_latency = None
+			self.write_time.reset()
+			self.queue_depth.reset()
+
+	def wrote(self, elapsed):
+		self.lines += 1
+		self.write_time.record(elapsed)
+
+	def overflow(self, slept):
+		self.buffer_overflows += 1
+		self.slept += slept
+
+	def timeout(self, slept):
+		self.timeouts += 1
+		self.slept += slept
+
+	# fraction of the lines OctoPrint sent that were merged into another
+	# line's packet rather than getting their own
+	def packet_reduction(self):
+		lines = self.lines + self.coalesced
+		return float(self.coalesced) / lines if lines else 0.0
+
+	def to_dict(self):
+		with self._lock:
+			elapsed = time.time() - self.started
+			return dict(
+				elapsed=elapsed,
+				lines=self.lines,
+				lines_per_sec=self.lines / elapsed if elapsed > 0 else 0.0,
+				buffer_overflows=self.buffer_overflows,
+				timeouts=self.timeouts,
+				slept=self.slept,
+				progress_updates=self.progress_updates,
+				coalesced=self.coalesced,
+				packet_reduction=self.packet_reduction(),
+				cancel_latency=self.cancel_latency,
+				write_time=self.write_time.to_dict(),
+				queue_depth=self.queue_depth.to_dict())
@@ -0,0 +1,47 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import threading
+import time
+
+# The last response gpx gave to an M105 (tool and platform temperatures).
+# OctoPrint's own M105 polls are answered from here while it is younger than
+# max_age seconds instead of spending several x3g queries on a serial link
+# that is busy with motion commands.
+class TemperatureCache():
+	def __init__(self, max_age, clock=time.time):
+		self.max_age = max_age
+		self._clock = clock
+		self._lock = threading.Lock()
+		self._response = None
+		self._updated = None
+		self.hits = 0
+		self.misses = 0
+
+	def store(self, response):
+		if not response or not response.startswith("ok"):
+			return
+		with self._lock:
+			self._response = response
+			self._updated = self._clock()
+
+	def age(self):
+		with self._lock:
+			if self._updated is None:
+				return None
+			return self._clock() - self._updated
+
+	def get(self):
+		with self._lock:
+			if self._response is not None and self._clock() - self._updated <= self.max_age:
+				self.hits += 1
+				return self._response
+			self.misses += 1
+			return None
+
+	def invalidate(self):
+		with self._lock:
+			self._response = None
+			self._updated = None
@@ -0,0 +1,118 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Offline gcode to x3g translation.  The gcodex3g extension only knows how to
+# translate onto a live serial connection and is a process wide singleton, so
+# for whole files we run the gpx command line tool built from the same sources
+# (GPX/build/src/gpx/gpx) with the same gpx.ini the plugin uses.
+
+import os
+import sys
+import subprocess
+import tempfile
+import threading
+import time
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+from .iniparser import _replace
+
+class TranslationError(Exception):
+	pass
+
+def find_gpx(gpx_path=None):
+	if gpx_path:
+		return gpx_path if os.path.isfile(gpx_path) else None
+	exe = "gpx.exe" if sys.platform == "win32" else "gpx"
+	for folder in os.environ.get("PATH", "").split(os.pathsep):
+		candidate = os.path.join(folder, exe)
+		if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+			return candidate
+	return None
+
+def _read_text(path):
+	if path is None or not os.path.isfile(path):
+		return ""
+	with open(path) as f:
+		return f.read()
+
+# gpx reads its ini top to bottom, so appending the machine definition
+# overrides (<machineid>.ini in the data folder) after gpx.ini gives us the
+# same effective settings the plugin presents in the machine dialog
+def effective_ini(profile_path, machine_path=None):
+	ini = _read_text(profile_path)
+	machine = _read_text(machine_path)
+	if machine:
+		if ini and not ini.endswith("\n"):
+			ini += "\n"
+		ini += machine
+	return ini
+
+def machine_type(iniparser):
+	machineid = iniparser.get("printer", "machine_type")
+	if not machineid:
+		machineid = "r2"
+	return machineid
+
+def _lower_priority():
+	try:
+		os.nice(10)
+	except (AttributeError, OSError):
+		pass
+
+# translate infile to outfile, returns the number of seconds it took
+def translate(gpx_exe, ini_text, infile, outfile, background=False):
+	if gpx_exe is None:
+		raise TranslationError("Unable to find the gpx command line tool")
+	outdir = os.path.dirname(os.path.abspath(outfile))
+	if not os.path.isdir(outdir):
+		os.makedirs(outdir)
+
+	fd, ini_path = tempfile.mkstemp(suffix=".ini")
+	with os.fdopen(fd, "w") as f:
+		f.write(ini_text)
+	# not .x3g so the x3g cache doesn't count or evict it while gpx writes it
+	fd, tmp_path = tempfile.mkstemp(prefix=".gpx", suffix=".part", dir=outdir)
+	os.close(fd)
+	try:
+		start = time.time()
+		preexec_fn = _lower_priority if background and sys.platform != "win32" else None
+		process = subprocess.Popen([gpx_exe, "-c", ini_path, infile, tmp_path],
+			stdout=subprocess.PIPE, stderr=subprocess.STDOUT, preexec_fn=preexec_fn)
+		output = process.communicate()[0]
+		if process.returncode != 0:
+			raise TranslationError("gpx exited with %d: %s" % (process.returncode,
+				output.decode("utf-8", "replace").strip()))
+		_replace(tmp_path, outfile)
+		return time.time() - start
+	finally:
+		os.remove(ini_path)
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+# Translates uploaded gcode files on a low priority background thread so the
+# work is done long before anyone presses print
+class BackgroundTranslator():
+	def __init__(self, logger):
+		self._logger = logger
+		self._jobs = queue.Queue()
+		self._thread = None
+
+	def submit(self, job, *args):
+		self._jobs.put((job, args))
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._work, name="GPX translator")
+			self._thread.daemon = True
+			self._thread.start()
+
+	def _work(self):
+		while True:
+			job, args = self._jobs.get()
+			try:
+				job(*args)
+			except Exception as e:
+				self._logger.warn("Background translation failed: %s" % e)
@@ -0,0 +1,104 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Start gcode usually sets and waits for each heater in turn (M190 then M109)
+# so the nozzle doesn't start heating until the bed is done.  When a job is
+# selected we read the heater targets out of the head of the file and start
+# them all heating at once, and when the job reaches its first wait we make
+# sure every heater has been told its target before the bot starts waiting,
+# so the job's waits overlap into one instead of adding up.
+
+# how far into the file to look for the start gcode's temperatures
+_scan_lines = 1000
+
+# What the heater commands mean depends on gpx.ini's gcode_flavor.  In
+# makerbot flavor M109 sets the build platform temperature without waiting
+# and it's M6 (wait for toolhead) and M116 (wait for all) that wait.
+_tool_commands = dict(reprap=("M104", "M109"), makerbot=("M104",))
+_bed_commands = dict(reprap=("M140", "M190"), makerbot=("M109", "M140"))
+_wait_commands = dict(reprap=("M109", "M190"), makerbot=("M6", "M116"))
+
+def _flavor(flavor):
+	return "makerbot" if flavor == "makerbot" else "reprap"
+
+# the commands that make the bot wait for its heaters in flavor
+def wait_commands(flavor):
+	return _wait_commands[_flavor(flavor)]
+
+def _words(line):
+	semi = line.find(";")
+	if semi >= 0:
+		line = line[:semi]
+	return line.split()
+
+# {"tools": {tool: temperature}, "bed": temperature or None} from the first
+# non-zero temperature each heater is set to in the first _scan_lines lines
+def scan_heat_targets(path, flavor="reprap", max_lines=_scan_lines):
+	tool_commands = _tool_commands[_flavor(flavor)]
+	bed_commands = _bed_commands[_flavor(flavor)]
+	tools = {}
+	bed = None
+	tool = 0
+	with open(path, "rb") as f:
+		for count, line in enumerate(f):
+			if count >= max_lines:
+				break
+			words = _words(line.decode("ascii", "replace"))
+			if not words:
+				continue
+			command = words[0].upper()
+			if command[:1] == "T" and command[1:].isdigit():
+				tool = int(command[1:])
+				continue
+			if command not in tool_commands and command not in bed_commands:
+				continue
+			params = {}
+			for word in words[1:]:
+				params[word[:1].upper()] = word[1:]
+			try:
+				temperature = int(float(params.get("S", 0)))
+				target = int(params["T"]) if "T" in params else tool
+			except ValueError:
+				continue
+			if temperature <= 0:
+				continue
+			if command in bed_commands:
+				if bed is None:
+					bed = temperature
+			elif target not in tools:
+				tools[target] = temperature
+	return dict(tools=tools, bed=bed)
+
+# the set temperature (no wait) commands for targets, M104 and M140 mean the
+# same thing in either flavor
+def heat_commands(targets):
+	commands = ["M104 T%d S%d" % (tool, temperature) for tool, temperature in sorted(targets["tools"].items())]
+	if targets["bed"] is not None:
+		commands.append("M140 S%d" % targets["bed"])
+	return commands
+
+# the commands that turn off the heaters heat_commands turned on
+def cool_commands(targets):
+	commands = ["M104 T%d S0" % tool for tool in sorted(targets["tools"])]
+	if targets["bed"] is not None:
+		commands.append("M140 S0")
+	return commands
+
+class WarmStart():
+	def __init__(self, path, targets, flavor="reprap"):
+		self.path = path
+		self.targets = targets
+		self.waits = wait_commands(flavor)
+		self.combined = False
+		# we turned the heaters on and the job hasn't taken them over yet
+		self.preheated = False
+
+	def empty(self):
+		return not self.targets["tools"] and self.targets["bed"] is None
+
+	# the commands to queue in place of the job's first heater wait
+	def combine(self, cmd):
+		self.combined = True
+		return heat_commands(self.targets) + [cmd]
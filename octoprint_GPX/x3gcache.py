@@ -0,0 +1,104 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+import hashlib
+import os
+import threading
+
+def hash_file(path, blocksize=1024*1024):
+	h = hashlib.sha1()
+	with open(path, "rb") as f:
+		while True:
+			block = f.read(blocksize)
+			if not block:
+				break
+			h.update(block)
+	return h.hexdigest()
+
+def hash_text(text):
+	if not isinstance(text, bytes):
+		text = text.encode("utf-8")
+	return hashlib.sha1(text).hexdigest()
+
+# Translated x3g files keyed on the content of the gcode and the settings it
+# was translated with, so a reprint of the same job with the same profile
+# skips translation entirely.  The least recently used entries are evicted
+# once the folder grows past max_bytes.  The file mtime doubles as the LRU
+# timestamp since atime is usually disabled on a Pi's SD card.  Only the x3g
+# print route reads from the cache, OctoPrint's own prints still stream the
+# gcode through gpx line by line.
+class X3gCache():
+	def __init__(self, folder, max_bytes, logger):
+		self.folder = folder
+		self.max_bytes = max_bytes
+		self._logger = logger
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def key(self, gcode_path, settings_hash):
+		return "%s-%s" % (hash_file(gcode_path), settings_hash[:16])
+
+	def path(self, key):
+		return os.path.join(self.folder, key + ".x3g")
+
+	def get(self, key):
+		path = self.path(key)
+		with self._lock:
+			if os.path.isfile(path):
+				os.utime(path, None)
+				self.hits += 1
+				return path
+			self.misses += 1
+		return None
+
+	# called after a new entry has been written to path(key)
+	def added(self, key):
+		with self._lock:
+			self._evict(keep=self.path(key))
+
+	def _entries(self):
+		entries = []
+		if not os.path.isdir(self.folder):
+			return entries
+		for name in os.listdir(self.folder):
+			# translations still being written are hidden .part files
+			if name.startswith(".") or not name.endswith(".x3g"):
+				continue
+			path = os.path.join(self.folder, name)
+			try:
+				st = os.stat(path)
+			except OSError:
+				continue
+			entries.append((st.st_mtime, st.st_size, path))
+		return entries
+
+	def _evict(self, keep=None):
+		entries = sorted(self._entries())
+		total = sum(size for mtime, size, path in entries)
+		for mtime, size, path in entries:
+			if total <= self.max_bytes:
+				break
+			if path == keep:
+				continue
+			try:
+				os.remove(path)
+				total -= size
+				self.evictions += 1
+				self._logger.debug("Evicted %s from the x3g cache" % path)
+			except OSError:
+				pass
+
+	def stats(self):
+		with self._lock:
+			entries = self._entries()
+			return dict(
+				hits=self.hits,
+				misses=self.misses,
+				evictions=self.evictions,
+				entries=len(entries),
+				bytes=sum(size for mtime, size, path in entries),
+				max_bytes=self.max_bytes)
@@ -0,0 +1,195 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# Streams an x3g file straight to the bot, one s3g packet per command, without
+# going through OctoPrint's line at a time send/ack cycle or gpx at all.
+# See https://github.com/makerbot/s3g/blob/master/doc/s3gProtocol.md
+
+import mmap
+import os
+import struct
+import threading
+
+from .flowcontrol import FlowControl
+
+# total length (including the command byte) of each fixed size action command
+_command_lengths = {
+	129: 17, # queue point absolute
+	130: 13, # set position
+	131: 8,  # find axes minimums
+	132: 8,  # find axes maximums
+	133: 5,  # delay
+	134: 2,  # change tool
+	135: 6,  # wait for tool ready
+	137: 2,  # enable/disable axes
+	139: 25, # queue extended point
+	140: 21, # set extended position
+	141: 6,  # wait for platform ready
+	142: 26, # queue extended point, new style
+	143: 2,  # store home positions
+	144: 2,  # recall home positions
+	145: 3,  # set digital potentiometer
+	146: 6,  # set RGB LED
+	147: 6,  # set beep
+	148: 5,  # wait for button
+	150: 3,  # set build percentage
+	151: 2,  # queue song
+	152: 2,  # reset to factory
+	154: 2,  # build end notification
+	155: 32, # queue extended point x3g
+	156: 2,  # set acceleration toggle
+	157: 21, # stream version
+	158: 5,  # pause at z position
+	}
+
+TOOL_ACTION = 136
+DISPLAY_MESSAGE = 149
+BUILD_START = 153
+
+PACKET_START = 0xD5
+QUERY_ABORT = 7
+QUERY_CLEAR_BUFFER = 3
+
+RESPONSE_SUCCESS = 0x81
+RESPONSE_BUFFER_OVERFLOW = 0x82
+RESPONSE_CRC_MISMATCH = 0x83
+RESPONSE_CANCEL_BUILD = 0x89
+
+class X3gError(Exception):
+	pass
+
+class X3gCancelled(Exception):
+	pass
+
+def _byte(buf, offset):
+	b = buf[offset]
+	return b if isinstance(b, int) else ord(b)
+
+def _string_end(buf, offset, length):
+	end = buf.find(b"\0", offset)
+	if end < 0 or end >= length:
+		raise X3gError("Unterminated string at offset %d" % offset)
+	return end + 1
+
+# yields the (offset, end) of each command in an x3g buffer
+def iter_commands(buf, length=None):
+	if length is None:
+		length = len(buf)
+	offset = 0
+	while offset < length:
+		command = _byte(buf, offset)
+		if command in _command_lengths:
+			end = offset + _command_lengths[command]
+		elif command == TOOL_ACTION:
+			end = offset + 4 + _byte(buf, offset + 3)
+		elif command == DISPLAY_MESSAGE:
+			end = _string_end(buf, offset + 5, length)
+		elif command == BUILD_START:
+			end = _string_end(buf, offset + 5, length)
+		else:
+			raise X3gError("Unknown x3g command %d at offset %d" % (command, offset))
+		if end > length:
+			raise X3gError("Truncated x3g command %d at offset %d" % (command, offset))
+		yield offset, end
+		offset = end
+
+# Maxim/Dallas iButton CRC8 used by s3g packets
+_crc_table = []
+for i in range(256):
+	crc = i
+	for j in range(8):
+		crc = (crc >> 1) ^ 0x8C if crc & 1 else crc >> 1
+	_crc_table.append(crc)
+
+def crc8(payload):
+	crc = 0
+	for b in bytearray(payload):
+		crc = _crc_table[crc ^ b]
+	return crc
+
+def packet(payload):
+	return struct.pack("<BB", PACKET_START, len(payload)) + bytes(payload) + struct.pack("<B", crc8(payload))
+
+class X3gStreamer():
+	def __init__(self, serial, logger, flow=None, progress=None):
+		self._serial = serial
+		self._logger = logger
+		self.flow = flow if flow is not None else FlowControl()
+		self._progress = progress
+		self._stop = threading.Event()
+		self.packets = 0
+
+	def stop(self):
+		self._stop.set()
+
+	def close(self):
+		self._serial.close()
+
+	def _read_response(self):
+		while True:
+			b = self._serial.read(1)
+			if not b:
+				return None
+			if bytearray(b)[0] == PACKET_START:
+				break
+		header = self._serial.read(1)
+		if not header:
+			return None
+		length = bytearray(header)[0]
+		payload = self._serial.read(length)
+		crc = self._serial.read(1)
+		if len(payload) != length or not crc or crc8(payload) != bytearray(crc)[0]:
+			return None
+		return bytearray(payload)
+
+	# send one packet, retrying on buffer overflow, CRC mismatch and timeouts,
+	# returns the response payload
+	def send(self, payload, retries=5):
+		data = packet(payload)
+		failures = 0
+		while True:
+			self._serial.write(data)
+			response = self._read_response()
+			if response is None or len(response) == 0 or response[0] == RESPONSE_CRC_MISMATCH:
+				failures += 1
+				if failures >= retries:
+					raise X3gError("No valid response from the bot")
+				continue
+			code = response[0]
+			if code == RESPONSE_SUCCESS:
+				self.flow.accepted()
+				return response
+			if code == RESPONSE_BUFFER_OVERFLOW:
+				if self._stop.is_set():
+					raise X3gCancelled()
+				self.flow.wait()
+				continue
+			if code == RESPONSE_CANCEL_BUILD:
+				raise X3gCancelled()
+			raise X3gError("Bot responded with error 0x%02x" % code)
+
+	def abort(self):
+		self.send(bytearray([QUERY_ABORT]))
+
+	def stream(self, path):
+		size = os.path.getsize(path)
+		if size == 0:
+			return 0
+		last_percent = -1
+		with open(path, "rb") as f:
+			buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			try:
+				for offset, end in iter_commands(buf, size):
+					if self._stop.is_set():
+						raise X3gCancelled()
+					self.send(buf[offset:end])
+					self.packets += 1
+					percent = end * 100 // size
+					if self._progress is not None and percent != last_percent:
+						last_percent = percent
+						self._progress(percent)
+			finally:
+				buf.close()
+		return self.packets
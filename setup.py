@@ -71,8 +71,10 @@ def params():
 	url = plugin_url
 	license = plugin_license
 
-	# we only have our plugin package to install
+	# we only have our plugin package to install, plus the entry point for
+	# the translator process which mustn't import the plugin package
 	packages = [plugin_package]
+	py_modules = ["gpxworker"]
 
 	# we might have additional data files in sub folders that need to be installed too
 	package_data = {plugin_package: package_data_dirs(plugin_package, ['static', 'templates', 'translations'] + plugin_additional_data)}
@@ -88,7 +90,8 @@ def params():
 	# Hook the plugin into the "octoprint.plugin" entry point, mapping the plugin_identifier to the plugin_package.
 	# That way OctoPrint will be able to find the plugin and load it.
 	entry_points = {
-		"octoprint.plugin": ["%s = %s" % (plugin_identifier, plugin_package)]
+		"octoprint.plugin": ["%s = %s" % (plugin_identifier, plugin_package)],
+		"console_scripts": ["gpx-batch = %s.batch:main" % plugin_package]
 	}
 
 	ext_modules = [
@@ -0,0 +1,11 @@
+# coding=utf-8
+from __future__ import absolute_import
+__author__ = "Mark Walker <markwal@hotmail.com>"
+__license__ = 'GNU Affero General Public License http://www.gnu.org/licenses/agpl.html'
+
+# The tests run against the simulated bot in benchmarks/fake_gcodex3g rather
+# than a real gcodex3g and a real printer.  It has to be in place before
+# octoprint_GPX.gpxprinter imports gcodex3g.
+
+from benchmarks import fake_gcodex3g
+fake_gcodex3g.install()
@@ -0,0 +1,34 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+from octoprint_GPX import gpxprinter
+
+class _ClearToSend():
+	def __init__(self, maximum):
+		self._max = maximum
+		self.credits = 0
+
+	def set(self):
+		self.credits = min(self._max, self.credits + 1)
+
+class _Comm():
+	def __init__(self, ack_max):
+		self._ack_max = ack_max
+		self._clear_to_send = _ClearToSend(ack_max)
+
+# the window is opened on this connection's comm, serial.ackMax is shared
+# with every other printer so it is left alone
+def test_ack_window_widens_only_this_connection():
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	settings = FakeSettings(ack_window=8)
+	printer = gpxprinter.GpxPrinter(FakePlugin(settings), "/dev/null", 115200, 1)
+	try:
+		comm = _Comm(1)
+		printer.open_ack_window(comm)
+		assert comm._ack_max == 8
+		assert comm._clear_to_send._max == 8
+		assert comm._clear_to_send.credits == 7
+	finally:
+		printer.close()
@@ -0,0 +1,53 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.bench_gpxprinter import FakePlugin, FakePrinter, FakeSettings
+from octoprint_GPX import gpxprinter
+
+class _Printing(FakePrinter):
+	def is_paused(self):
+		return False
+
+class _Plugin(FakePlugin):
+	def __init__(self, settings, data_folder):
+		FakePlugin.__init__(self, settings)
+		self._printer = _Printing()
+		self._data_folder = data_folder
+
+	def get_plugin_data_folder(self):
+		return self._data_folder
+
+def _checksummed(line):
+	cs = 0
+	for c in line:
+		cs ^= ord(c)
+	return ("%s*%d\n" % (line, cs)).encode("ascii")
+
+# a setting that is safe mid print is laid over gpx's current settings at the
+# next layer, which mustn't leave gpx in the reprap flavor the last host
+# command switched it to
+def test_overlay_at_the_next_layer_keeps_the_gcode_flavor(tmpdir):
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	profile_path = os.path.join(str(tmpdir), "gpx.ini")
+	with open(profile_path, "w") as f:
+		f.write("[printer]\nmachine_type=r2\ngcode_flavor=makerbot\nbuild_progress=1\n")
+	printer = gpxprinter.GpxPrinter(_Plugin(FakeSettings(), str(tmpdir)), "/dev/null", 115200, 1)
+	try:
+		gpx.reprap_flavor(False)
+		with open(profile_path, "w") as f:
+			f.write("[printer]\nmachine_type=r2\ngcode_flavor=makerbot\nbuild_progress=0\n")
+		printer.refresh_ini()
+		printer.write(_checksummed("N1 G1 X1"))
+		printer.write(b"M105\n")
+		printer.write(_checksummed("N2 G1 Z0.4"))
+		printer.write(_checksummed("N3 G1 X2"))
+		assert [line.split("*")[0] for reprap, line in gpx.bot.translated[-2:]] == ["N2 G1 Z0.4", "N3 G1 X2"]
+		assert [reprap for reprap, line in gpx.bot.translated[-2:]] == [False, False]
+		printer.write(b"M105\n")
+		printer.write(_checksummed("N4 G1 X3"))
+		assert gpx.bot.translated[-1] == (False, _checksummed("N4 G1 X3").decode("ascii").strip())
+	finally:
+		printer.close()
@@ -0,0 +1,43 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+from octoprint_GPX import gpxprinter
+
+# a bot paused at its LCD never makes room for the next line, closing the
+# connection has to give up on it rather than wait for the bot to resume
+def _stall(settings, queued):
+	gpx.configure(capacity=1, drain_rate=0)
+	printer = gpxprinter.GpxPrinter(FakePlugin(settings), "/dev/null", 115200, 1)
+	printer.write(b"G1 X1\n")
+	writers = []
+	for i in range(queued):
+		writer = threading.Thread(target=printer.write, args=(("G1 X%d\n" % (i + 2)).encode("ascii"),))
+		writer.daemon = True
+		writer.start()
+		writers.append(writer)
+	while gpx.bot.overflows == 0:
+		time.sleep(0.01)
+	return printer, writers
+
+def _closes_quickly(printer):
+	start = time.time()
+	printer.close()
+	return time.time() - start < 2
+
+def test_close_while_a_line_waits_on_a_full_buffer():
+	printer, writers = _stall(FakeSettings(), 1)
+	assert _closes_quickly(printer)
+	writers[0].join(2)
+	assert not writers[0].is_alive()
+
+def test_close_with_a_full_writer_queue():
+	printer, writers = _stall(FakeSettings(threaded_writer=True, writer_queue_size=2), 3)
+	while not printer._send_queue.full():
+		time.sleep(0.01)
+	assert _closes_quickly(printer)
+	assert printer._writer is None
@@ -0,0 +1,63 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_GPX.coalesce import SegmentCoalescer, PASS, HELD, MERGED, _checksum
+
+def _coalescer(tolerance=0.01):
+	coalescer = SegmentCoalescer(tolerance)
+	assert coalescer.feed("G92 X0 Y0 E0") == (None, PASS)
+	return coalescer
+
+def test_merges_colinear_moves():
+	coalescer = _coalescer()
+	assert coalescer.feed("G1 X1 Y0 E0.1") == (None, HELD)
+	assert coalescer.feed("G1 X2 Y0 E0.2") == (None, MERGED)
+	assert coalescer.feed("G1 X3 Y0.001 E0.3") == (None, MERGED)
+	assert coalescer.take() == "G1 X3.000 Y0.001 E0.30000"
+	assert not coalescer.pending()
+
+def test_single_move_goes_out_as_is():
+	coalescer = _coalescer()
+	coalescer.feed("G1 X1 Y0 E0.1 ; comment")
+	assert coalescer.take() == "G1 X1 Y0 E0.1 ; comment"
+
+def test_corner_ends_the_run():
+	coalescer = _coalescer()
+	coalescer.feed("G1 X1 Y0 E0.1")
+	coalescer.feed("G1 X2 Y0 E0.2")
+	flushed, action = coalescer.feed("G1 X2 Y1 E0.3")
+	assert flushed == "G1 X2.000 Y0.000 E0.20000"
+	assert action == HELD
+
+def test_other_commands_flush_and_pass():
+	coalescer = _coalescer()
+	coalescer.feed("G1 X1 Y0 E0.1")
+	assert coalescer.feed("M105") == ("G1 X1 Y0 E0.1", PASS)
+
+def test_relative_moves_pass():
+	coalescer = _coalescer()
+	assert coalescer.feed("G91") == (None, PASS)
+	assert coalescer.feed("G1 X1 Y0") == (None, PASS)
+
+def test_numbered_run_keeps_the_last_line_number():
+	coalescer = _coalescer()
+	coalescer.feed("N1 G1 X1 Y0 E0.1*1")
+	assert coalescer.feed("N2 G1 X2 Y0 E0.2*2") == (None, MERGED)
+	line = coalescer.take()
+	body, checksum = line.split("*")
+	assert body == "N2 G1 X2.000 Y0.000 E0.20000"
+	assert int(checksum) == _checksum(body)
+
+def test_numbered_run_needs_consecutive_lines():
+	coalescer = _coalescer()
+	coalescer.feed("N1 G1 X1 Y0 E0.1*1")
+	flushed, action = coalescer.feed("N3 G1 X2 Y0 E0.2*3")
+	assert flushed == "N1 G1 X1 Y0 E0.1*1"
+	assert action == HELD
+
+def test_numbered_and_host_moves_dont_mix():
+	coalescer = _coalescer()
+	coalescer.feed("N1 G1 X1 Y0 E0.1*1")
+	flushed, action = coalescer.feed("G1 X2 Y0 E0.2")
+	assert flushed is not None
+	assert action == HELD
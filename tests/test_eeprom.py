@@ -0,0 +1,21 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+from octoprint_GPX import gpxprinter
+
+# the eeprom routes run on OctoPrint's web threads, alongside the comm thread
+# and the printer's own threads, so they have to go through the link
+def test_eeprom_calls_hold_the_link(monkeypatch):
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	printer = gpxprinter.GpxPrinter(FakePlugin(FakeSettings()), "/dev/null", 115200, 1)
+	calls = []
+	monkeypatch.setattr(gpx, "read_eeprom", lambda eepromid: calls.append(printer._link._is_owned()) or 42)
+	monkeypatch.setattr(gpx, "write_eeprom", lambda eepromid, value: calls.append(printer._link._is_owned()) or value)
+	try:
+		assert printer.read_eeprom("TOOL_COUNT") == 42
+		assert printer.write_eeprom("TOOL_COUNT", 2) == 2
+	finally:
+		printer.close()
+	assert calls == [True, True]
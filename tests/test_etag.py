@@ -0,0 +1,73 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+
+import pytest
+
+from octoprint_GPX import gpxplugin
+from octoprint_GPX.gpxplugin import GPXPlugin
+
+class _Etags():
+	def __init__(self, etags):
+		self._etags = etags
+
+	def contains(self, etag):
+		return etag in self._etags
+
+class _Request():
+	def __init__(self, *etags):
+		self.if_none_match = _Etags(etags)
+
+class _Response():
+	def __init__(self, body, status=200):
+		self.body = body
+		self.status = status
+		self.headers = {}
+		self.etag = None
+
+	def set_etag(self, etag):
+		self.etag = etag
+
+@pytest.fixture
+def plugin(monkeypatch):
+	monkeypatch.setattr(gpxplugin, "make_response", _Response)
+	plugin = GPXPlugin()
+	# normally set up by _initialize
+	plugin._bodies = {}
+	return plugin
+
+def test_body_is_made_once_per_version(plugin):
+	made = []
+	def make():
+		made.append(1)
+		return dict(machine=dict(nozzle_diameter=0.4))
+	body = plugin._body("r2", "v1", make)
+	assert json.loads(body) == dict(machine=dict(nozzle_diameter=0.4))
+	assert plugin._body("r2", "v1", make) is body
+	assert len(made) == 1
+	plugin._body("r2", "v2", make)
+	assert len(made) == 2
+
+def test_new_client_gets_the_body(plugin, monkeypatch):
+	monkeypatch.setattr(gpxplugin, "request", _Request())
+	response = plugin._etag_response('{"a": 1}')
+	assert response.status == 200
+	assert response.body == '{"a": 1}'
+	assert response.headers["Content-Type"] == "application/json"
+	assert response.headers["Cache-Control"] == "no-cache"
+	assert response.etag is not None
+
+def test_client_with_the_etag_gets_304(plugin, monkeypatch):
+	monkeypatch.setattr(gpxplugin, "request", _Request())
+	etag = plugin._etag_response('{"a": 1}').etag
+	monkeypatch.setattr(gpxplugin, "request", _Request(etag))
+	response = plugin._etag_response('{"a": 1}')
+	assert response.status == 304
+	assert response.body == ""
+	assert response.etag == etag
+	assert response.headers["Cache-Control"] == "no-cache"
+	# a stale etag gets the new body
+	response = plugin._etag_response('{"a": 2}')
+	assert response.status == 200
+	assert response.etag != etag
@@ -0,0 +1,46 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.compare_flavor import mixed_lines, reference, tracked
+from octoprint_GPX.flavor import FlavorTracker
+
+class _Gpx():
+	def __init__(self, reprap):
+		self.reprap = reprap
+		self.calls = 0
+
+	def reprap_flavor(self, reprap):
+		self.calls += 1
+		previous = self.reprap
+		self.reprap = reprap
+		return previous
+
+def test_tracker_switches_once_per_run():
+	fake = _Gpx(False)
+	flavor = FlavorTracker(fake)
+	flavor.host()
+	flavor.host()
+	assert fake.reprap
+	flavor.stream()
+	flavor.stream()
+	assert not fake.reprap
+	assert fake.calls == 2
+	assert flavor.switches == 2
+
+def test_tracker_leaves_reprap_alone():
+	fake = _Gpx(True)
+	flavor = FlavorTracker(fake)
+	flavor.host()
+	flavor.stream()
+	assert fake.reprap
+	assert fake.calls == 1
+
+def test_tracker_matches_switching_around_every_line():
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	lines = list(mixed_lines(2000))
+	for base in (False, True):
+		expected, expected_calls = reference(lines, base)
+		actual, calls = tracked(lines, base)
+		assert actual == expected
+		assert calls <= expected_calls
@@ -0,0 +1,65 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import pytest
+
+from octoprint_GPX.flowcontrol import FlowControl
+
+class _Clock():
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+def _flow(**kwargs):
+	clock = _Clock()
+	return FlowControl(clock=clock, **kwargs), clock
+
+def test_first_overflow_waits_the_minimum():
+	flow, clock = _flow()
+	assert flow.overflow() == flow.min_delay
+
+def test_backs_off_exponentially_up_to_the_maximum():
+	flow, clock = _flow(min_delay=0.01, max_delay=0.05)
+	assert [flow.overflow() for i in range(5)] == [0.01, 0.02, 0.04, 0.05, 0.05]
+
+def test_paused_bot_waits_the_paused_delay():
+	flow, clock = _flow(paused_delay=1.0)
+	assert flow.overflow(paused=True) == 1.0
+
+# the time it took the bot to make room is what the next overflow waits
+def test_learns_the_drain_interval_from_stalls():
+	flow, clock = _flow(min_delay=0.005, max_delay=1.0)
+	flow.overflow()
+	flow.overflow()
+	clock.now += 0.1
+	flow.accepted()
+	assert flow.stats()["drain_interval"] == pytest.approx(0.1)
+	flow.overflow()
+	clock.now += 0.02
+	flow.accepted()
+	# a single retry got in, guess low
+	assert flow.stats()["drain_interval"] == pytest.approx(0.1 + 0.2 * (0.01 - 0.1))
+	assert flow.overflow() == flow.stats()["drain_interval"]
+
+def test_stats():
+	flow, clock = _flow()
+	flow.accepted()
+	flow.overflow()
+	clock.now += 0.5
+	flow.accepted()
+	clock.now += 0.5
+	stats = flow.stats()
+	assert stats["lines"] == 2
+	assert stats["overflows"] == 1
+	assert stats["lines_per_sec"] == pytest.approx(2.0)
+	assert stats["stalled_secs"] == pytest.approx(0.5)
+	assert "estimated_capacity" not in stats
+
+def test_reset():
+	flow, clock = _flow()
+	flow.overflow()
+	flow.reset()
+	assert flow.stats()["overflows"] == 0
+	assert flow.stats()["drain_interval"] is None
@@ -0,0 +1,91 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+
+from octoprint_GPX.iniparser import IniParser
+
+_logger = logging.getLogger("octoprint.plugins.GPX.tests")
+
+def _parser(tmpdir, text):
+	path = tmpdir.join("gpx.ini")
+	path.write(text)
+	return IniParser(path.strpath, _logger), path
+
+# same mtime and size but different contents, only the hash tells them apart
+def test_cache_is_keyed_on_the_contents(tmpdir):
+	parser, path = _parser(tmpdir, "[printer]\nmachine_type=r1\n")
+	st = os.stat(path.strpath)
+	assert parser.read()["printer"]["machine_type"] == "r1"
+	version = parser.version
+	path.write("[printer]\nmachine_type=r2\n")
+	os.utime(path.strpath, (st.st_atime, st.st_mtime))
+	assert parser.read()["printer"]["machine_type"] == "r2"
+	assert parser.version != version
+
+def test_unchanged_file_reuses_the_parse(tmpdir):
+	parser, path = _parser(tmpdir, "[printer]\nmachine_type=r1\n")
+	parser.read()
+	other = IniParser(path.strpath, _logger)
+	assert other.read() == parser.ini
+	assert other.version == parser.version
+
+# each reader gets its own copy to update
+def test_updates_dont_leak_into_the_cache(tmpdir):
+	parser, path = _parser(tmpdir, "[printer]\nmachine_type=r1\n")
+	parser.read()
+	parser.update(dict(printer=dict(machine_type="r2", build_progress=True)))
+	other = IniParser(path.strpath, _logger)
+	other.read()
+	assert other.ini["printer"] == dict(machine_type="r1")
+	assert other.serialize() == ("[printer]\nmachine_type=r1\n", 1)
+
+def test_write_invalidates(tmpdir):
+	parser, path = _parser(tmpdir, "[printer]\nmachine_type=r1\n")
+	parser.read()
+	parser.update(dict(printer=dict(machine_type="r2")))
+	parser.write()
+	other = IniParser(path.strpath, _logger)
+	assert other.read()["printer"]["machine_type"] == "r2"
+	assert other.version == parser.version
+
+_profile = """; written by hand
+[printer]
+machine_type=r2 ; Replicator 2
+gcode_flavor=makerbot
+
+; dual extruder
+build_progress = 1
+
+[extruder]
+; left
+nozzle_temperature=220
+
+
+"""
+
+def test_round_trip_keeps_comments_and_blanks(tmpdir):
+	parser, path = _parser(tmpdir, _profile)
+	parser.read()
+	assert parser.get("printer", "build_progress") == "1"
+	assert parser.serialize() == (_profile, 11)
+
+# new options go at the end of their section, ahead of its trailing blanks,
+# and changed values keep their comment
+def test_update_then_serialize(tmpdir):
+	parser, path = _parser(tmpdir, _profile)
+	parser.read()
+	parser.update(dict(printer=dict(machine_type="r1", gcode_flavor=None), extruder=dict(nozzle_diameter=0.4)))
+	text, count = parser.serialize()
+	assert text == _profile.replace("r2 ;", "r1 ;").replace("gcode_flavor=makerbot\n", "").replace(
+		"nozzle_temperature=220\n", "nozzle_temperature=220\nnozzle_diameter=0.4\n")
+	assert count == 11
+
+def test_write_then_read(tmpdir):
+	parser, path = _parser(tmpdir, _profile)
+	parser.read()
+	parser.update(dict(printer=dict(machine_type="r1")))
+	parser.write()
+	assert path.read() == _profile.replace("r2 ;", "r1 ;")
+	assert tmpdir.listdir() == [path]
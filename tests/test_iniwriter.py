@@ -0,0 +1,49 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+
+from octoprint_GPX.iniparser import IniParser
+from octoprint_GPX.iniwriter import IniWriter
+
+_logger = logging.getLogger("octoprint.plugins.GPX.tests")
+
+def _parser(tmpdir, text="[printer]\nmachine_type=r2 ; the bot\n"):
+	path = tmpdir.join("gpx.ini")
+	path.write(text)
+	parser = IniParser(str(path), _logger)
+	parser.read()
+	return parser
+
+def test_update_is_written_on_flush(tmpdir):
+	parser = _parser(tmpdir)
+	writer = IniWriter(_logger, delay=60)
+	writer.update(parser, {"printer": {"build_progress": "1"}})
+	assert writer.pending(parser.filename) is parser
+	assert "build_progress" not in tmpdir.join("gpx.ini").read()
+	writer.flush()
+	assert writer.pending(parser.filename) is None
+	assert tmpdir.join("gpx.ini").read() == "[printer]\nmachine_type=r2 ; the bot\nbuild_progress=1\n"
+
+def test_update_keeps_comments_and_reads_back(tmpdir):
+	parser = _parser(tmpdir)
+	writer = IniWriter(_logger, delay=60)
+	writer.update(parser, {"printer": {"machine_type": "r1"}})
+	writer.flush()
+	assert tmpdir.join("gpx.ini").read() == "[printer]\nmachine_type=r1 ; the bot\n"
+	reread = IniParser(parser.filename, _logger)
+	assert reread.read()["printer"]["machine_type"] == "r1"
+
+class _Broken():
+	filename = "broken.ini"
+
+	def write(self):
+		raise RuntimeError("dictionary changed size during iteration")
+
+def test_failed_write_is_logged_not_raised(caplog):
+	writer = IniWriter(_logger, delay=60)
+	writer.schedule(_Broken())
+	with caplog.at_level(logging.ERROR):
+		writer.flush()
+	assert "Unable to write broken.ini" in caplog.text
+	assert writer.pending("broken.ini") is None
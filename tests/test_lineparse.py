@@ -0,0 +1,24 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_GPX.lineparse import has_line_number, m73_percent, is_z_move
+
+def test_has_line_number():
+	assert has_line_number("N12 G1 X1*34")
+	assert has_line_number(b"N1 M105*3")
+	assert not has_line_number("M105")
+	assert not has_line_number(b"G1 X1")
+	assert not has_line_number("N")
+	assert not has_line_number("")
+
+def test_m73_percent():
+	assert m73_percent("N5 M73 P42") == 42
+	assert m73_percent("M73 P42") is None
+	assert m73_percent("N5 G1 X1") is None
+
+def test_is_z_move():
+	assert is_z_move("G1 Z0.4")
+	assert is_z_move(b"N7 G0 X1 Z2*1")
+	assert not is_z_move("G1 X1 Y2")
+	assert not is_z_move("G92 Z0")
+	assert not is_z_move(b"M117 Z is next")
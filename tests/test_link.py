@@ -0,0 +1,35 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+from benchmarks import fake_gcodex3g as gpx
+from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+from octoprint_GPX import gpxprinter
+
+# a line waiting for room in a full buffer mustn't keep the link, the reader,
+# the temperature poller and preheat all need it while the bot is stalled
+def test_link_is_free_while_the_bot_buffer_is_full():
+	gpx.configure(capacity=1, drain_rate=0)
+	printer = gpxprinter.GpxPrinter(FakePlugin(FakeSettings()), "/dev/null", 115200, 1)
+	try:
+		printer.write(b"G1 X1\n")
+		writer = threading.Thread(target=printer.write, args=(b"G1 X2\n",))
+		writer.daemon = True
+		writer.start()
+		while gpx.bot.overflows == 0:
+			writer.join(0.01)
+		linked = threading.Event()
+		def use_link():
+			with printer._link:
+				linked.set()
+		user = threading.Thread(target=use_link)
+		user.daemon = True
+		user.start()
+		assert linked.wait(2)
+		assert writer.is_alive()
+	finally:
+		printer._cancelling.set()
+		writer.join(5)
+		printer.close()
+	assert not writer.is_alive()
@@ -0,0 +1,40 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from octoprint_GPX.profilediff import ProfileDiff, profile
+
+def test_profile_drops_the_preamble():
+	ini = OrderedDict([("None", {"x": "1"}), ("printer", {"machine_type": "r2"})])
+	assert profile(ini) == {"printer": {"machine_type": "r2"}}
+
+def test_unchanged():
+	old = {"printer": {"machine_type": "r2"}}
+	assert not ProfileDiff(old, {"printer": {"machine_type": "r2"}})
+
+def test_safe_change_is_an_overlay():
+	old = {"printer": {"machine_type": "r2", "build_progress": "1"}}
+	new = {"printer": {"machine_type": "r2", "build_progress": "0"}}
+	diff = ProfileDiff(old, new)
+	assert diff
+	assert diff.keys() == [("printer", "build_progress")]
+	assert diff.changes("printer", "build_progress")
+	assert not diff.changes("printer", "machine_type")
+	assert not diff.needs_reset()
+	assert diff.safe_mid_print()
+	assert diff.ini_text() == "[printer]\nbuild_progress=0\n"
+
+def test_geometry_waits_for_the_end_of_the_print():
+	diff = ProfileDiff({"x": {"steps_per_mm": "88"}}, {"x": {"steps_per_mm": "90"}})
+	assert not diff.needs_reset()
+	assert not diff.safe_mid_print()
+
+def test_flavor_change_waits_for_the_end_of_the_print():
+	diff = ProfileDiff({"printer": {"gcode_flavor": "reprap"}}, {"printer": {"gcode_flavor": "makerbot"}})
+	assert diff.changes("printer", "gcode_flavor")
+	assert not diff.safe_mid_print()
+
+def test_removal_and_machine_change_need_a_reset():
+	assert ProfileDiff({"printer": {"build_progress": "1"}}, {"printer": {}}).needs_reset()
+	assert ProfileDiff({"printer": {"machine_type": "r2"}}, {"printer": {"machine_type": "r1"}}).needs_reset()
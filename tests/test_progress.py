@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_GPX.progress import ProgressUpdater
+
+class _Clock():
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+def _updater(accept=True):
+	sent = []
+	def send(percent):
+		sent.append(percent)
+		return accept
+	clock = _Clock()
+	return ProgressUpdater(send, min_interval=5.0, clock=clock), sent, clock
+
+def test_nothing_to_send():
+	updater, sent, clock = _updater()
+	updater.poll()
+	assert sent == []
+
+def test_sends_at_the_next_gap():
+	updater, sent, clock = _updater()
+	updater.update(10.7)
+	assert sent == []
+	updater.poll()
+	updater.poll()
+	assert sent == [10]
+
+def test_at_most_once_per_interval_and_only_the_latest():
+	updater, sent, clock = _updater()
+	updater.update(1)
+	updater.poll()
+	updater.update(2)
+	updater.update(3)
+	clock.now += 4
+	updater.poll()
+	assert sent == [1]
+	clock.now += 1
+	updater.poll()
+	assert sent == [1, 3]
+
+def test_unchanged_percent_is_not_resent():
+	updater, sent, clock = _updater()
+	updater.update(5)
+	updater.poll()
+	clock.now += 10
+	updater.update(5.5)
+	updater.poll()
+	assert sent == [5]
+
+def test_retries_when_the_bot_is_busy():
+	updater, sent, clock = _updater(accept=False)
+	updater.update(7)
+	updater.poll()
+	updater.poll()
+	assert sent == [7, 7]
+
+def test_reset_forgets_what_was_sent():
+	updater, sent, clock = _updater()
+	updater.update(5)
+	updater.poll()
+	updater.reset()
+	updater.update(5)
+	updater.poll()
+	assert sent == [5, 5]
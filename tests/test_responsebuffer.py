@@ -0,0 +1,43 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+from octoprint_GPX.responsebuffer import ResponseBuffer
+
+def test_append_splits_and_encodes():
+	buf = ResponseBuffer()
+	buf.append("ok T:210\necho: hello")
+	buf.append(b"ok")
+	assert buf.qsize() == 3
+	assert buf.drain() == [b"ok T:210", b"echo: hello", b"ok"]
+	assert buf.qsize() == 0
+
+def test_append_ignores_empty_responses():
+	buf = ResponseBuffer()
+	buf.append("")
+	buf.append(None)
+	assert buf.get_nowait() is None
+
+def test_put_keeps_empty_lines():
+	buf = ResponseBuffer()
+	buf.put("")
+	assert buf.get_nowait() == b""
+
+def test_lines_come_out_in_order():
+	buf = ResponseBuffer()
+	for i in range(3):
+		buf.put("ok %d" % i)
+	assert [buf.get_nowait() for i in range(4)] == [b"ok 0", b"ok 1", b"ok 2", None]
+
+def test_get_times_out():
+	assert ResponseBuffer().get(timeout=0.01) is None
+
+def test_get_wakes_on_append():
+	buf = ResponseBuffer()
+	timer = threading.Timer(0.05, buf.append, args=("ok",))
+	timer.start()
+	try:
+		assert buf.get(timeout=5) == b"ok"
+	finally:
+		timer.join()
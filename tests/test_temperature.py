@@ -0,0 +1,50 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_GPX.temperature import TemperatureCache
+
+class _Clock():
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+def _cache():
+	clock = _Clock()
+	return TemperatureCache(2.0, clock=clock), clock
+
+def test_empty():
+	cache, clock = _cache()
+	assert cache.get() is None
+	assert cache.age() is None
+	assert cache.misses == 1
+
+def test_fresh_response_is_a_hit():
+	cache, clock = _cache()
+	cache.store("ok T:210.0 /210.0 B:60.0 /60.0")
+	clock.now += 2.0
+	assert cache.age() == 2.0
+	assert cache.get() == "ok T:210.0 /210.0 B:60.0 /60.0"
+	assert cache.hits == 1
+
+def test_expires_after_max_age():
+	cache, clock = _cache()
+	cache.store("ok T:210.0 /210.0")
+	clock.now += 2.5
+	assert cache.get() is None
+	assert cache.misses == 1
+
+# only a temperature report is worth repeating to OctoPrint
+def test_ignores_anything_but_ok():
+	cache, clock = _cache()
+	cache.store("")
+	cache.store("Error: timeout")
+	assert cache.get() is None
+
+def test_invalidate():
+	cache, clock = _cache()
+	cache.store("ok T:210.0 /210.0")
+	cache.invalidate()
+	assert cache.get() is None
+	assert cache.age() is None
@@ -0,0 +1,100 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+
+from octoprint.events import Events
+from octoprint.filemanager import FileDestinations
+
+from octoprint_GPX.gpxplugin import GPXPlugin
+from octoprint_GPX.iniparser import IniParser
+from octoprint_GPX.iniwriter import IniWriter
+
+class _Settings():
+	def __init__(self, **values):
+		self._values = values
+
+	def get_boolean(self, path):
+		return bool(self._values.get(path[0]))
+
+class _Printer():
+	printing = False
+
+	def is_printing(self):
+		return self.printing
+
+	def get_current_job(self):
+		return dict(file=dict(name="a.gcode", origin=FileDestinations.LOCAL))
+
+class _FileManager():
+	def __init__(self, folder):
+		self._folder = folder
+
+	def path_on_disk(self, destination, path):
+		return self._folder.join(path).strpath
+
+class _GpxPrinter():
+	def __init__(self):
+		self.sent = []
+
+	def preheat(self, commands):
+		self.sent.append(commands)
+		return True
+
+	def clear_bot_cancelled(self):
+		pass
+
+class _Translator():
+	def __init__(self):
+		self.jobs = []
+
+	def submit(self, job, *args):
+		self.jobs.append(args)
+
+def _plugin(tmpdir, **settings):
+	tmpdir.join("gpx.ini").write("[printer]\nmachine_type=r2\n")
+	tmpdir.join("a.gcode").write("M140 S60\nM104 S220 T0\nM190 S60\nM109 S220\n")
+	tmpdir.join("b.gcode").write("M104 S200 T1\nM109 S200 T1\n")
+	plugin = GPXPlugin()
+	plugin._initialized = True
+	plugin._logger = logging.getLogger("octoprint.plugins.GPX.tests")
+	plugin._settings = _Settings(**settings)
+	plugin._printer = _Printer()
+	plugin._file_manager = _FileManager(tmpdir)
+	plugin.iniparser = IniParser(tmpdir.join("gpx.ini").strpath, plugin._logger)
+	plugin.ini_writer = IniWriter(plugin._logger)
+	plugin.translator = _Translator()
+	plugin.printer = _GpxPrinter()
+	return plugin
+
+def _select(plugin, path):
+	plugin.on_event(Events.FILE_SELECTED, dict(origin=FileDestinations.LOCAL, path=path))
+
+def test_reselect_and_deselect_turn_off_what_was_preheated(tmpdir):
+	plugin = _plugin(tmpdir, warm_start=True, pretranslate=True)
+	_select(plugin, "a.gcode")
+	_select(plugin, "b.gcode")
+	plugin.on_event(Events.FILE_DESELECTED, dict(origin=FileDestinations.LOCAL, path="b.gcode"))
+	assert plugin.printer.sent == [
+		["M104 T0 S220", "M140 S60"],
+		["M104 T0 S0", "M140 S0"],
+		["M104 T1 S200"],
+		["M104 T1 S0"]]
+	assert plugin.translator.jobs == [("a.gcode",), ("b.gcode",)]
+	assert plugin.warm_start is None
+
+def test_pretranslate_without_warm_start(tmpdir):
+	plugin = _plugin(tmpdir, pretranslate=True)
+	_select(plugin, "a.gcode")
+	plugin.on_event(Events.FILE_DESELECTED, dict(origin=FileDestinations.LOCAL, path="a.gcode"))
+	assert plugin.printer.sent == []
+	assert plugin.translator.jobs == []
+
+def test_the_job_takes_the_heaters_over(tmpdir):
+	plugin = _plugin(tmpdir, warm_start=True, clear_coords_on_print_start=True)
+	_select(plugin, "a.gcode")
+	plugin.gcode_scripts(None, "gcode", "beforePrintStarted")
+	assert not plugin.warm_start.combined
+	plugin.on_event(Events.FILE_DESELECTED, dict(origin=FileDestinations.LOCAL, path="a.gcode"))
+	assert plugin.printer.sent == [["M104 T0 S220", "M140 S60"]]
+	assert plugin.translator.jobs == []
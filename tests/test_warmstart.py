@@ -0,0 +1,49 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_GPX.warmstart import WarmStart, scan_heat_targets, heat_commands, cool_commands
+
+_start_gcode = """; start
+M140 S60 ; bed
+M104 S220 T0
+T1
+M104 S230
+M190 S60
+M109 S220 T0
+M109 S110
+G1 X0
+"""
+
+def _gcode(tmpdir, text=_start_gcode):
+	path = tmpdir.join("part.gcode")
+	path.write(text)
+	return str(path)
+
+def test_reprap_flavor(tmpdir):
+	targets = scan_heat_targets(_gcode(tmpdir), "reprap")
+	assert targets == dict(tools={0: 220, 1: 230}, bed=60)
+	assert heat_commands(targets) == ["M104 T0 S220", "M104 T1 S230", "M140 S60"]
+	assert cool_commands(targets) == ["M104 T0 S0", "M104 T1 S0", "M140 S0"]
+
+def test_makerbot_flavor_m109_is_the_platform(tmpdir):
+	targets = scan_heat_targets(_gcode(tmpdir, "M104 S220 T0\nM109 S110\nM6 T0\n"), "makerbot")
+	assert targets == dict(tools={0: 220}, bed=110)
+
+def test_unknown_flavor_is_reprap(tmpdir):
+	assert scan_heat_targets(_gcode(tmpdir), None) == scan_heat_targets(_gcode(tmpdir), "reprap")
+
+def test_scan_stops_at_max_lines(tmpdir):
+	targets = scan_heat_targets(_gcode(tmpdir, "G1 X0\nM104 S220\n"), max_lines=1)
+	assert targets == dict(tools={}, bed=None)
+
+def test_combine_once(tmpdir):
+	warm_start = WarmStart("part.gcode", dict(tools={0: 220}, bed=60))
+	assert warm_start.waits == ("M109", "M190")
+	assert warm_start.combine("M190 S60") == ["M104 T0 S220", "M140 S60", "M190 S60"]
+	assert warm_start.combined
+
+def test_makerbot_waits():
+	warm_start = WarmStart("part.gcode", dict(tools={}, bed=None), "makerbot")
+	assert warm_start.empty()
+	assert "M109" not in warm_start.waits
+	assert "M6" in warm_start.waits
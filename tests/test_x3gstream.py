@@ -0,0 +1,83 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import struct
+
+import pytest
+
+from octoprint_GPX.x3gstream import iter_commands, crc8, packet, X3gError, PACKET_START
+
+def test_iter_commands():
+	delay = struct.pack("<BI", 133, 1000)
+	message = struct.pack("<BBBBB", 149, 0, 0, 0, 0) + b"hello\0"
+	tool_action = struct.pack("<BBBB", 136, 0, 3, 2) + b"\x01\x02"
+	buf = delay + message + tool_action
+	ends = [end for offset, end in iter_commands(buf)]
+	assert ends == [len(delay), len(delay) + len(message), len(buf)]
+
+def test_unknown_command():
+	with pytest.raises(X3gError):
+		list(iter_commands(b"\x01\x02"))
+
+def test_truncated_command():
+	with pytest.raises(X3gError):
+		list(iter_commands(struct.pack("<BH", 133, 0)))
+
+def test_unterminated_string():
+	with pytest.raises(X3gError):
+		list(iter_commands(struct.pack("<BBBBB", 149, 0, 0, 0, 0) + b"hello"))
+
+def test_packet():
+	payload = b"\x85\x01\x02"
+	framed = packet(payload)
+	assert bytearray(framed)[0] == PACKET_START
+	assert bytearray(framed)[1] == len(payload)
+	assert framed[2:-1] == payload
+	assert bytearray(framed)[-1] == crc8(payload)
+	assert crc8(b"") == 0
+
+# while the streamer owns the serial port OctoPrint's lines are acked so its
+# counting stays in step, but not silently
+def test_lines_written_while_streaming_are_reported_dropped():
+	from benchmarks import fake_gcodex3g as gpx
+	from benchmarks.bench_gpxprinter import FakePlugin, FakeSettings
+	from octoprint_GPX import gpxprinter
+
+	gpx.configure(capacity=1000000, drain_rate=1e9)
+	printer = gpxprinter.GpxPrinter(FakePlugin(FakeSettings()), "/dev/null", 115200, 1)
+	try:
+		printer.outgoing.drain()
+		printer._streamer = object()
+		printer.write(b"G1 X1\n")
+		printer.write(b"M105\n")
+		assert printer.outgoing.drain() == [b"// echo: x3g stream in progress, not sent: G1 X1", b"ok", b"ok"]
+		assert gpx.bot.translated == []
+	finally:
+		printer._streamer = None
+		printer.close()
+
+def test_print_started_while_streaming_is_cancelled():
+	import logging
+	from octoprint.events import Events
+	from octoprint_GPX.gpxplugin import GPXPlugin
+
+	class Printer():
+		cancelled = False
+		def cancel_print(self):
+			self.cancelled = True
+
+	class Streaming():
+		def __init__(self):
+			self.echoed = []
+		def is_streaming(self):
+			return True
+		def echo(self, message):
+			self.echoed.append(message)
+
+	plugin = GPXPlugin()
+	plugin._logger = logging.getLogger("octoprint.plugins.GPX.tests")
+	plugin._printer = Printer()
+	plugin.printer = Streaming()
+	plugin.on_event(Events.PRINT_STARTED, dict())
+	assert plugin._printer.cancelled
+	assert plugin.printer.echoed == ["x3g stream in progress, cancelling the print"]